@@ -0,0 +1,126 @@
+"""Compares sequential, concurrent and cached use of the client on recorded traffic.
+
+Record the workload against a kitty once, this adds and afterwards deletes a few
+expenses named "pykitty benchmark ...":
+
+    poetry run python benchmarks/bench_client_modes.py record "<kitty_URL>" "<your_username>" traffic.jsonl.gz
+
+Then replay it offline, with the recorded latencies scaled by --latency-scale:
+
+    poetry run python benchmarks/bench_client_modes.py replay "<kitty_URL>" "<your_username>" traffic.jsonl.gz [--latency-scale 1.0]
+"""
+
+import argparse
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+from pykitty.client import KittySplitAPI
+from pykitty.server import KittyCache
+from pykitty.transport import RecordingAdapter, ReplayAdapter, TransportConfig
+
+BENCHMARK_DESCRIPTION = "pykitty benchmark"
+BENCHMARK_DATE = "2023-03-06"  # fixed so that the writes replay
+
+
+def run_get_expenses(mode: str, api: KittySplitAPI, username: str, repeat: int):
+    if mode == "sequential":
+        for _ in range(repeat):
+            api.get_expenses()
+    elif mode == "concurrent":
+        with ThreadPoolExecutor(repeat) as executor:
+            for future in [executor.submit(api.get_expenses) for _ in range(repeat)]:
+                future.result()
+    else:
+        cache = KittyCache(api, username)
+        cache.refresh()
+        for _ in range(repeat):
+            cache.get_expenses()
+
+
+def run_get_expense(mode: str, api: KittySplitAPI, username: str, entry_ids, repeat):
+    if mode == "sequential":
+        for _ in range(repeat):
+            for entry_id in entry_ids:
+                api.get_expense(entry_id)
+    elif mode == "concurrent":
+        for _ in range(repeat):
+            api.get_expense_details(entry_ids, max_workers=len(entry_ids))
+    else:
+        cache = KittyCache(api, username)
+        for _ in range(repeat):
+            for entry_id in entry_ids:
+                cache.get_expense(entry_id)
+
+
+def run_add_expense(mode: str, api: KittySplitAPI, username: str, writes: int):
+    expenses = [
+        dict(
+            amount=f"{index + 1}.00",
+            description=f"{BENCHMARK_DESCRIPTION} {mode} {index}",
+            entry_date=BENCHMARK_DATE,
+        )
+        for index in range(writes)
+    ]
+    if mode == "sequential":
+        for expense in expenses:
+            api.add_expense(**expense)
+    elif mode == "concurrent":
+        with ThreadPoolExecutor(writes) as executor:
+            futures = [executor.submit(api.add_expense, **e) for e in expenses]
+            for future in futures:
+                future.result()
+    else:
+        cache = KittyCache(api, username, write_interval=0)
+        for expense in expenses:
+            cache.add_expense(username, **expense)
+
+
+def delete_benchmark_expenses(api: KittySplitAPI) -> None:
+    for expense in api.get_expenses():
+        if expense["description"].startswith(BENCHMARK_DESCRIPTION):
+            api.delete_expense(expense["id"])
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("action", choices=["record", "replay"])
+    parser.add_argument("kitty_url")
+    parser.add_argument("username")
+    parser.add_argument("archive")
+    parser.add_argument("--latency-scale", type=float, default=1.0)
+    parser.add_argument("--repeat", type=int, default=5)
+    parser.add_argument("--details", type=int, default=10)
+    parser.add_argument("--writes", type=int, default=3)
+    parser.add_argument("--base-url", help="e.g. a staging instance to record")
+    args = parser.parse_args()
+
+    if args.action == "record":
+        adapter = RecordingAdapter(args.archive)
+    else:
+        adapter = ReplayAdapter(args.archive, latency_scale=args.latency_scale)
+        print(f"Replaying {len(adapter)} responses from {args.archive}")
+    transport = TransportConfig(adapter=adapter, base_url=args.base_url)
+    api = KittySplitAPI(args.kitty_url, transport=transport)
+    api.select_user(args.username)
+    entry_ids = [expense["id"] for expense in api.get_expenses()][: args.details]
+
+    print(f"{'mode':<12}{'get_expenses':>14}{'get_expense':>14}{'add_expense':>14}")
+    for mode in ("sequential", "concurrent", "cached"):
+        timings = []
+        for run in (
+            lambda: run_get_expenses(mode, api, args.username, args.repeat),
+            lambda: run_get_expense(mode, api, args.username, entry_ids, args.repeat),
+            lambda: run_add_expense(mode, api, args.username, args.writes),
+        ):
+            start = time.perf_counter()
+            run()
+            timings.append(time.perf_counter() - start)
+        print(f"{mode:<12}" + "".join(f"{timing:>13.3f}s" for timing in timings))
+
+    if args.action == "record":
+        delete_benchmark_expenses(api)
+        adapter.close()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,113 @@
+"""Benchmarks the ParsingExecutor with an increasing number of worker processes.
+
+Usage:
+    poetry run python benchmarks/bench_parsing.py [--entries 20000] [--details 2000]
+"""
+
+import argparse
+import os
+import time
+
+from pykitty.kitty_parser import ExpenseType
+from pykitty.parse_executor import ParsingExecutor
+
+ENTRY_HTML = """
+<li class="py-1 entry-list-item entry-all entry-yours">
+    <a class="entry-link" href="/test_kitty/ADLKFJLAKD/entries/{id}/edit">
+        <div class="row">
+            <div class="col-xs-11">
+                Test User hat <span class="currency"><span class="currency-symbol">€</span>{id},57</span> für Entry {id} bezahlt.
+            </div>
+        </div>
+        <div class="row">
+            <div class="entry-meta col-xs-12">
+                <span class="entry-label entry-label-parties">
+                    Teilnehmer: <span class="entry-parties">Alle</span>.
+                </span>
+                <span class="entry-label entry-label-date">27.03.2023</span>
+                <span class="entry-label entry-label-share accent-color-primary">Dein Anteil: <span class="currency"><span class="currency-symbol">€</span>11,79</span></span>
+            </div>
+        </div>
+    </a>
+</li>
+"""
+
+DETAIL_SHARE_HTML = """
+<input type="hidden" name="entry[entry_shares][{idx}][id]" value="{idx}">
+<input type="hidden" name="entry[entry_shares][{idx}][party_id]" value="{idx}">
+<input type="text" name="entry[entry_shares][{idx}][share_str]" value="4.475">
+<input type="hidden" name="entry[entry_shares][{idx}][weight]" value="0.5">
+"""
+
+DETAIL_HTML = """
+<html><body><nav>{padding}</nav>
+<form class="edit-entry-form">
+    <input type="hidden" name="_csrf_token" value="token">
+    <input type="hidden" name="entry[entry_type]" value="expense">
+    <input type="text" name="entry[amount]" value="{id}.95">
+    <input type="text" name="entry[description]" value="Entry {id}">
+    <input type="date" name="entry[entry_date_str]" value="2023-03-06">
+    {shares}
+    <select name="entry[party_id]"><option value="1" selected>Test User</option></select>
+</form>
+</body></html>
+"""
+
+
+def entries_page(number_of_entries: int) -> bytes:
+    entries = "".join(ENTRY_HTML.format(id=id) for id in range(number_of_entries))
+    return f'<html><ul class="entries">{entries}</ul></html>'.encode()
+
+
+def detail_pages(number_of_pages: int) -> list:
+    shares = "".join(DETAIL_SHARE_HTML.format(idx=idx) for idx in range(8))
+    padding = "<div><a href='#'>link</a></div>" * 200
+    return [
+        DETAIL_HTML.format(id=id, shares=shares, padding=padding).encode()
+        for id in range(number_of_pages)
+    ]
+
+
+def timed(func) -> float:
+    start = time.perf_counter()
+    func()
+    return time.perf_counter() - start
+
+
+def main() -> None:
+    arg_parser = argparse.ArgumentParser()
+    arg_parser.add_argument("--entries", type=int, default=20000)
+    arg_parser.add_argument("--details", type=int, default=2000)
+    args = arg_parser.parse_args()
+
+    listing = entries_page(args.entries)
+    pages = detail_pages(args.details)
+    print(
+        f"entries page: {args.entries} entries, {len(listing) / 2**20:.1f} MiB; "
+        f"detail pages: {args.details} pages, {sum(map(len, pages)) / 2**20:.1f} MiB"
+    )
+
+    worker_counts = [1]
+    while worker_counts[-1] * 2 <= (os.cpu_count() or 1):
+        worker_counts.append(worker_counts[-1] * 2)
+
+    print(
+        f"{'workers':>7} {'entries (s)':>12} {'speedup':>8} {'details (s)':>12} {'speedup':>8}"
+    )
+    baseline = None
+    for workers in worker_counts:
+        with ParsingExecutor(max_workers=workers, min_parallel_bytes=0) as executor:
+            executor.parse_expense_details(pages[: workers * 2])  # start the workers
+            entries_time = timed(
+                lambda: executor.parse_expenses(listing, ExpenseType.ALL)
+            )
+            details_time = timed(lambda: executor.parse_expense_details(pages))
+        baseline = baseline or (entries_time, details_time)
+        print(
+            f"{workers:>7} {entries_time:>12.2f} {baseline[0] / entries_time:>7.1f}x "
+            f"{details_time:>12.2f} {baseline[1] / details_time:>7.1f}x"
+        )
+
+
+if __name__ == "__main__":
+    main()
@@ -1,12 +1,17 @@
 import csv
+import json
 import time
+from contextlib import nullcontext
 from datetime import datetime
-from typing import Union
+from pathlib import Path
+from typing import Dict, List, Union
 
 import typer
+from rich.console import Console
 from rich.progress import track
+from rich.table import Table
 
-from pykitty import client
+from pykitty import client, profiling, server, session_store, transport, watcher
 
 app = typer.Typer()
 
@@ -16,6 +21,77 @@ def convert_date_format(date_string: str) -> str:
     return datetime_obj.strftime("%Y-%m-%d")
 
 
+def build_transport(
+    base_url: Union[str, None],
+    connect_timeout: float,
+    read_timeout: float,
+    pool_connections: int,
+    pool_maxsize: int,
+    pool_block: bool,
+    keep_alive: bool,
+) -> transport.TransportConfig:
+    return transport.TransportConfig(
+        connect_timeout=connect_timeout,
+        read_timeout=read_timeout,
+        pool_connections=pool_connections,
+        pool_maxsize=pool_maxsize,
+        pool_block=pool_block,
+        keep_alive=keep_alive,
+        base_url=base_url,
+    )
+
+
+def build_weight_mapping(
+    available_users: Dict[str, str],
+    kitty_username: str,
+    expense_weight: Union[float, None],
+) -> Union[Dict[str, float], None]:
+    if expense_weight is None:
+        return None
+
+    weight_mapping = dict()
+    for username in available_users.keys():
+        if username == kitty_username:
+            weight_mapping[kitty_username] = expense_weight
+        else:
+            weight_mapping[username] = (1 - expense_weight) / len(
+                available_users.keys()
+            )
+    return weight_mapping
+
+
+def read_expenses(csv_file) -> List[dict]:
+    reader = csv.DictReader(csv_file, delimiter=";")
+    expenses = list()
+    for row in reader:
+        expenses.append(
+            {
+                "amount": str(-float(row["Betrag"].replace(",", "."))),
+                "description": row["Name"],
+                "entry_date": convert_date_format(row["Datum"]),
+            }
+        )
+    return expenses
+
+
+def print_profile(profiler: profiling.PhaseProfiler) -> None:
+    table = Table(title=f"Profile ({profiler.wall_time:.2f}s wall time)")
+    table.add_column("Phase")
+    table.add_column("Count", justify="right")
+    table.add_column("Total (s)", justify="right")
+    table.add_column("Mean (ms)", justify="right")
+    table.add_column("Wall time", justify="right")
+    for name, count, total, share in profiler.rows():
+        table.add_row(
+            name,
+            str(count),
+            f"{total:.3f}",
+            f"{total / count * 1000:.1f}",
+            f"{share:.1%}",
+        )
+    Console().print(table)
+
+
 @app.callback()
 def callback():
     """
@@ -30,6 +106,18 @@ def add_expenses(
     csv_file: typer.FileText,
     expense_weight: Union[float, None] = None,
     timeout_between_requests: float = 0.5,
+    persist_session: bool = False,
+    session_dir: Union[Path, None] = None,
+    base_url: Union[str, None] = None,
+    connect_timeout: float = 10.0,
+    read_timeout: float = 30.0,
+    pool_connections: int = 10,
+    pool_maxsize: int = 10,
+    pool_block: bool = False,
+    keep_alive: bool = True,
+    profile: bool = False,
+    profile_stats: Union[Path, None] = None,
+    profile_collapsed: Union[Path, None] = None,
 ):
     """Adds expenses to Kittysplit
 
@@ -39,54 +127,237 @@ def add_expenses(
         csv_file (typer.FileText): The path to the csv file, e.g. "~/expenses.csv"
         expense_weight (float, optional): The weights for your expenses, e.g. '0.4' would assign your expenses a weight of 0.4 while it distributes the weights of the other users equally. Defaults to None.
         timeout_between_requests (float, optional): Be nice to Kittysplit and add timeouts between the requests. Defaults to 0.5.
+        persist_session (bool, optional): Reuse cookies, users and tokens of previous runs for this kitty. Defaults to False.
+        session_dir (Path, optional): The directory the session state is stored in. Defaults to "~/.cache/pykitty/sessions".
+        base_url (str, optional): The Kittysplit url to send the requests to. Defaults to "https://kittysplit.de/".
+        connect_timeout (float, optional): Seconds to wait for a connection to Kittysplit. Defaults to 10.
+        read_timeout (float, optional): Seconds to wait for a response of Kittysplit. Defaults to 30.
+        pool_connections (int, optional): The number of hosts connection pools are kept for. Defaults to 10.
+        pool_maxsize (int, optional): The maximum number of connections kept per host. Defaults to 10.
+        pool_block (bool, optional): Wait for a free connection instead of opening one beyond --pool-maxsize, so that --pool-maxsize caps the connections per host. Defaults to False.
+        keep_alive (bool, optional): Reuse connections across requests. Defaults to True.
+        profile (bool, optional): Print how the wall time is spent per phase. Defaults to False.
+        profile_stats (Path, optional): Dump a cProfile pstats file of the run, implies --profile. Defaults to None.
+        profile_collapsed (Path, optional): Write sampled collapsed stacks of the run for a flame graph, implies --profile. Defaults to None.
     """
-    kitty_api = client.KittySplitAPI(kitty_url)
-    kitty_api.select_user(kitty_username)
+    profiler = None
+    if profile or profile_stats or profile_collapsed:
+        profiler = profiling.PhaseProfiler(
+            stats_path=profile_stats, collapsed_path=profile_collapsed
+        )
+        profiler.start()
 
-    # calculate weight mapping
-    if expense_weight is not None:
-        weight_mapping = dict()
-        for username in kitty_api.available_users.keys():
-            if username == kitty_username:
-                weight_mapping[kitty_username] = expense_weight
-            else:
-                weight_mapping[username] = (1 - expense_weight) / len(
-                    kitty_api.available_users.keys()
-                )
-    else:
-        weight_mapping = None
+    def phase(name: str):
+        return profiler.phase(name) if profiler else nullcontext()
 
-    # read csv file
-    reader = csv.DictReader(csv_file, delimiter=";")
-    expenses = list()
-    for row in reader:
-        expenses.append(
-            {
-                "amount": str(-float(row["Betrag"].replace(",", "."))),
-                "description": row["Name"],
-                "entry_date": convert_date_format(row["Datum"]),
-            }
-        )
+    try:
+        with phase("csv read/normalize"):
+            expenses = read_expenses(csv_file)
+
+        with phase("user discovery"):
+            store = session_store.SessionStore(session_dir) if persist_session else None
+            kitty_api = client.KittySplitAPI(
+                kitty_url,
+                session_store=store,
+                transport=build_transport(
+                    base_url,
+                    connect_timeout,
+                    read_timeout,
+                    pool_connections,
+                    pool_maxsize,
+                    pool_block,
+                    keep_alive,
+                ),
+                profiler=profiler,
+            )
 
-    # add expenses to Kittysplit
-    added_expenses_counter = 0
-    for expense in track(expenses, description="Adding expenses..."):
-        kitty_api.add_expense(
-            amount=expense["amount"],
-            description=expense["description"],
-            entry_date=expense["entry_date"],
-            weight_mapping=weight_mapping,
+        with phase("select_user"):
+            kitty_api.select_user(kitty_username)
+
+        weight_mapping = build_weight_mapping(
+            kitty_api.available_users, kitty_username, expense_weight
         )
-        added_expenses_counter += 1
 
-        time.sleep(timeout_between_requests)
+        # add expenses to Kittysplit
+        added_expenses_counter = 0
+        for expense in track(expenses, description="Adding expenses..."):
+            with phase("add_expense"):
+                kitty_api.add_expense(
+                    amount=expense["amount"],
+                    description=expense["description"],
+                    entry_date=expense["entry_date"],
+                    weight_mapping=weight_mapping,
+                )
+            added_expenses_counter += 1
+
+            with phase("sleep"):
+                time.sleep(timeout_between_requests)
+    finally:
+        if profiler:
+            profiler.stop()
+            print_profile(profiler)
 
     print(
         f"Added {added_expenses_counter} expenses! Total expenses amount added: {sum([float(expense['amount']) for expense in expenses])}"
     )
     print()
     print("Check your expenses! Will open your kitty...")
-    typer.launch(f"https://kittysplit.de/{kitty_api.kitty_id}/entries/")
+    typer.launch(f"{kitty_api.base_url}{kitty_api.kitty_id}/entries/")
+
+
+@app.command()
+def serve(
+    config_file: typer.FileText,
+    host: str = "127.0.0.1",
+    port: int = 8080,
+    refresh_interval: float = 60.0,
+    write_interval: float = 0.5,
+    persist_session: bool = False,
+    session_dir: Union[Path, None] = None,
+    base_url: Union[str, None] = None,
+    connect_timeout: float = 10.0,
+    read_timeout: float = 30.0,
+    pool_connections: int = 10,
+    pool_maxsize: int = 10,
+    pool_block: bool = False,
+    keep_alive: bool = True,
+):
+    """Serves the users and expenses of kitties as JSON from a shared cache
+
+    Args:
+        config_file (typer.FileText): A JSON file mapping names to kitties, e.g. {"flat": {"url": "https://kittysplit.de/...", "username": "user1"}}. The expenses are fetched as the given user.
+        host (str, optional): The address to listen on. Defaults to "127.0.0.1".
+        port (int, optional): The port to listen on. Defaults to 8080.
+        refresh_interval (float, optional): Seconds between two polls of a kitty. Defaults to 60.
+        write_interval (float, optional): Minimum seconds between two writes to a kitty. Defaults to 0.5.
+        persist_session (bool, optional): Reuse cookies, users and tokens of previous runs for the kitties. Defaults to False.
+        session_dir (Path, optional): The directory the session state is stored in. Defaults to "~/.cache/pykitty/sessions".
+        base_url (str, optional): The Kittysplit url to send the requests to. Defaults to "https://kittysplit.de/".
+        connect_timeout (float, optional): Seconds to wait for a connection to Kittysplit. Defaults to 10.
+        read_timeout (float, optional): Seconds to wait for a response of Kittysplit. Defaults to 30.
+        pool_connections (int, optional): The number of hosts connection pools are kept for. Defaults to 10.
+        pool_maxsize (int, optional): The maximum number of connections kept per host. Defaults to 10.
+        pool_block (bool, optional): Wait for a free connection instead of opening one beyond --pool-maxsize, so that --pool-maxsize caps the connections per host. Defaults to False.
+        keep_alive (bool, optional): Reuse connections across requests. Defaults to True.
+    """
+    store = session_store.SessionStore(session_dir) if persist_session else None
+    kitty_transport = build_transport(
+        base_url,
+        connect_timeout,
+        read_timeout,
+        pool_connections,
+        pool_maxsize,
+        pool_block,
+        keep_alive,
+    )
+
+    kitties = dict()
+    for name, kitty_config in json.load(config_file).items():
+        kitty_api = client.KittySplitAPI(
+            kitty_config["url"], session_store=store, transport=kitty_transport
+        )
+        kitties[name] = server.KittyCache(
+            kitty_api,
+            kitty_config["username"],
+            refresh_interval=refresh_interval,
+            write_interval=write_interval,
+        )
+
+    kitty_server = server.KittyServer((host, port), kitties)
+    kitty_server.start_caches()
+    print(
+        f"Serving {len(kitties)} kitties on http://{host}:{kitty_server.server_port}/kitties"
+    )
+    try:
+        kitty_server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        kitty_server.server_close()
+
+
+@app.command()
+def watch(
+    kitty_url: str,
+    kitty_username: str,
+    directory: Path,
+    processed_dir: Union[Path, None] = None,
+    failed_dir: Union[Path, None] = None,
+    expense_weight: Union[float, None] = None,
+    timeout_between_requests: float = 0.5,
+    poll_interval: float = 2.0,
+    batch_size: int = 20,
+    queue_size: int = 100,
+    report_interval: float = 60.0,
+    persist_session: bool = False,
+    session_dir: Union[Path, None] = None,
+    base_url: Union[str, None] = None,
+    connect_timeout: float = 10.0,
+    read_timeout: float = 30.0,
+    pool_connections: int = 10,
+    pool_maxsize: int = 10,
+    pool_block: bool = False,
+    keep_alive: bool = True,
+):
+    """Watches a directory and adds the expenses of new csv files to Kittysplit
+
+    Args:
+        kitty_url (str): The Kittysplit url, e.g. https://kittysplit.de/test_kitty/ADFKYapVh5_N4wlMKZmPFhAiGqfz2_44-2
+        kitty_username (str): Your Kittysplit username.
+        directory (Path): The directory to watch for csv files in the format of add-expenses.
+        processed_dir (Path, optional): Where files are moved to once their expenses are added. Defaults to "<directory>/processed".
+        failed_dir (Path, optional): Where files are moved to if they could not be read or an expense could not be added. Defaults to "<directory>/failed".
+        expense_weight (float, optional): The weights for your expenses, see add-expenses. Defaults to None.
+        timeout_between_requests (float, optional): Be nice to Kittysplit and add timeouts between the requests. Defaults to 0.5.
+        poll_interval (float, optional): Seconds between two scans of the directory. Defaults to 2.
+        batch_size (int, optional): The maximum number of expenses taken off the queue at once. Defaults to 20.
+        queue_size (int, optional): The maximum number of expenses waiting to be added, scanning pauses while the queue is full. Defaults to 100.
+        report_interval (float, optional): Seconds between two throughput reports. Defaults to 60.
+        persist_session (bool, optional): Reuse cookies, users and tokens of previous runs for this kitty. Defaults to False.
+        session_dir (Path, optional): The directory the session state is stored in. Defaults to "~/.cache/pykitty/sessions".
+        base_url (str, optional): The Kittysplit url to send the requests to. Defaults to "https://kittysplit.de/".
+        connect_timeout (float, optional): Seconds to wait for a connection to Kittysplit. Defaults to 10.
+        read_timeout (float, optional): Seconds to wait for a response of Kittysplit. Defaults to 30.
+        pool_connections (int, optional): The number of hosts connection pools are kept for. Defaults to 10.
+        pool_maxsize (int, optional): The maximum number of connections kept per host. Defaults to 10.
+        pool_block (bool, optional): Wait for a free connection instead of opening one beyond --pool-maxsize, so that --pool-maxsize caps the connections per host. Defaults to False.
+        keep_alive (bool, optional): Reuse connections across requests. Defaults to True.
+    """
+    store = session_store.SessionStore(session_dir) if persist_session else None
+    kitty_api = client.KittySplitAPI(
+        kitty_url,
+        session_store=store,
+        transport=build_transport(
+            base_url,
+            connect_timeout,
+            read_timeout,
+            pool_connections,
+            pool_maxsize,
+            pool_block,
+            keep_alive,
+        ),
+    )
+    kitty_api.select_user(kitty_username)
+
+    csv_watcher = watcher.CSVWatcher(
+        kitty_api,
+        directory,
+        read_expenses,
+        processed_dir=processed_dir,
+        failed_dir=failed_dir,
+        weight_mapping=build_weight_mapping(
+            kitty_api.available_users, kitty_username, expense_weight
+        ),
+        poll_interval=poll_interval,
+        batch_size=batch_size,
+        queue_size=queue_size,
+        timeout_between_requests=timeout_between_requests,
+    )
+    print(f"Watching {directory} for csv files, press Ctrl+C to stop...")
+    try:
+        csv_watcher.run(report=print, report_interval=report_interval)
+    except KeyboardInterrupt:
+        pass
 
 
 if __name__ == "__main__":
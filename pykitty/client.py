@@ -1,10 +1,19 @@
+import copy
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from contextlib import contextmanager, nullcontext
 from datetime import datetime
-from typing import Dict, List, Union
+from typing import ContextManager, Dict, Iterator, List, Sequence, Tuple, Union
 from urllib.parse import quote, urlparse
 
 import requests
 
 from pykitty import kitty_parser
+from pykitty.parse_executor import ParsingExecutor
+from pykitty.profiling import PhaseProfiler
+from pykitty.session_store import SessionStore, dump_cookies, load_cookies
+from pykitty.singleflight import SingleFlight
+from pykitty.transport import TransportConfig
 
 
 def fill_query_params(query, *args):
@@ -27,9 +36,12 @@ def parse_kitty_id(kitty_url) -> str:
 
 
 def get_csrf_token(
-    session: requests.Session, base_url: str, path: str
+    session: requests.Session,
+    base_url: str,
+    path: str,
+    timeout: Union[float, Tuple[float, float], None] = None,
 ) -> Union[str, None]:
-    response = session.get(base_url + path)
+    response = session.get(base_url + path, timeout=timeout)
     csrf_parser = kitty_parser.CSRFHTMLParser()
     csrf_parser.feed(response.text)
     return csrf_parser.csrf_token
@@ -40,11 +52,31 @@ def kitty_endpoint(
     method: str = "GET",
     csrf_protected: bool = False,
     user_needs_to_be_selected: bool = False,
+    coalesce: bool = False,
 ):
     def decorator(func):
         def wrapper(self, *args, **kwargs):
-            if user_needs_to_be_selected and self.selected_viewing_party_id is None:
-                raise ValueError("No user selected!")
+            if not coalesce:
+                return call(self, *args, **kwargs)
+
+            # concurrent identical reads share one request and parse
+            key = (
+                self.kitty_id,
+                func.__qualname__,
+                path,
+                self.selected_viewing_party_id,
+                args,
+                tuple(sorted(kwargs.items())),
+            )
+            return self._flights.do(key, lambda: call(self, *args, **kwargs))
+
+        def call(self, *args, **kwargs):
+            if user_needs_to_be_selected:
+                if self.selected_viewing_party_id is None:
+                    raise ValueError("No user selected!")
+                if self.server_viewing_party_id != self.selected_viewing_party_id:
+                    # the server switched the party, e.g. because the session expired
+                    self._set_viewing_party(self.selected_viewing_party_id)
 
             kwargs.update(
                 {
@@ -52,15 +84,30 @@ def kitty_endpoint(
                     "method": method,
                 }
             )
-            if csrf_protected:
-                kwargs.update(
-                    {
-                        "csrf_token": get_csrf_token(self.session, self.base_url, path),
-                    }
-                )
-
-            # call the function with the modified kwargs
-            return func(self, *args, **kwargs)
+            if not csrf_protected:
+                # call the function with the modified kwargs
+                return func(self, *args, **kwargs)
+
+            # forms change the server side session, so only one is submitted at a time
+            with self._lock:
+                reused_csrf_token = self.csrf_token is not None
+                kwargs["csrf_token"] = self._get_csrf_token(path)
+                try:
+                    result = func(self, *args, **kwargs)
+                except requests.HTTPError as error:
+                    if not reused_csrf_token or error.response.status_code != 403:
+                        raise
+                    # the reused session expired, retry once in the new session,
+                    # which neither knows the token nor the selected party
+                    self.csrf_token = None
+                    self.server_viewing_party_id = None
+                    if user_needs_to_be_selected:
+                        self._set_viewing_party(self.selected_viewing_party_id)
+                    kwargs["csrf_token"] = self._get_csrf_token(path)
+                    result = func(self, *args, **kwargs)
+                    self._save_session_state()
+
+                return result
 
         return wrapper
 
@@ -68,13 +115,100 @@ def kitty_endpoint(
 
 
 class KittySplitAPI:
+    """Client for a single kitty.
+
+    An instance can be shared across threads. As the selected user is part of the
+    server side session, threads acting on behalf of different users should use
+    `as_user`, which binds a user to its own session.
+    """
+
     base_url = "https://kittysplit.de/"
 
-    def __init__(self, kitty_url: str) -> None:
+    def __init__(
+        self,
+        kitty_url: str,
+        session_store: Union[SessionStore, None] = None,
+        parsing_executor: Union[ParsingExecutor, None] = None,
+        transport: Union[TransportConfig, None] = None,
+        profiler: Union[PhaseProfiler, None] = None,
+    ) -> None:
         self.kitty_id = parse_kitty_id(kitty_url)
-        self.session: requests.Session = requests.Session()
-        self.available_users: Dict[str, str] = self.get_users()
+        self.transport = transport or TransportConfig()
+        if self.transport.base_url is not None:
+            self.base_url = self.transport.base_url
+        self.session: requests.Session = self.transport.configure_session(
+            requests.Session()
+        )
+        self._lock = threading.RLock()
+        self._root = self
+        self._lanes: Dict[str, "KittySplitAPI"] = {}
+        self._bound_username: Union[str, None] = None
+        self._flights = SingleFlight()
+        self.session_store = session_store
+        self.parsing_executor = parsing_executor
+        self.profiler = profiler
+        self.csrf_token: Union[str, None] = None
+        self.available_users: Dict[str, str] = {}
         self.selected_viewing_party_id: Union[str, None] = None
+        # the party the server side session is viewing as, as far as we know
+        self.server_viewing_party_id: Union[str, None] = None
+
+        if not self._restore_session_state():
+            self.available_users = self.get_users()
+            self._save_session_state()
+
+    def _restore_session_state(self) -> bool:
+        if self.session_store is None:
+            return False
+
+        state = self.session_store.load(self.kitty_id)
+        if state is None:
+            return False
+
+        load_cookies(self.session.cookies, state.get("cookies", []))
+        self.available_users = state["available_users"]
+        self.selected_viewing_party_id = state.get("selected_viewing_party_id")
+        # the stored session might have expired, which reads do not reveal. Leaving
+        # the party unknown makes the first select POST it, which validates the
+        # session and renews it if it was rejected
+        self.server_viewing_party_id = None
+        self.csrf_token = state.get("csrf_token")
+        return True
+
+    def _save_session_state(self) -> None:
+        if self.session_store is None:
+            return
+
+        self.session_store.save(
+            self.kitty_id,
+            {
+                "cookies": dump_cookies(self.session.cookies),
+                "available_users": self.available_users,
+                "selected_viewing_party_id": self.selected_viewing_party_id,
+                "csrf_token": self.csrf_token,
+            },
+        )
+
+    def _phase(self, name: str) -> ContextManager[None]:
+        if self.profiler is None:
+            return nullcontext()
+        return self.profiler.phase(name)
+
+    def _get_csrf_token(self, path: str) -> Union[str, None]:
+        # the token is bound to the session, so it can be reused for every form
+        if self.csrf_token is None:
+            with self._phase("csrf fetch"):
+                self.csrf_token = get_csrf_token(
+                    self.session, self.base_url, path, timeout=self.transport.timeout
+                )
+        return self.csrf_token
+
+    def _track_viewing_party(self, html: str) -> None:
+        # only pages listing an expense paid by the viewing party reveal it,
+        # otherwise the tracked party is kept
+        viewing_party_name = kitty_parser.parse_viewing_party_name(html)
+        if viewing_party_name in self.available_users:
+            self.server_viewing_party_id = self.available_users[viewing_party_name]
 
     def _request(
         self,
@@ -86,26 +220,77 @@ class KittySplitAPI:
         url = self.base_url + self.kitty_id + path
         if csrf_token:
             data["_csrf_token"] = csrf_token
-        response = self.session.request(method, url, data=data)
+        with self._phase("request"):
+            response = self.session.request(
+                method, url, data=data, timeout=self.transport.timeout
+            )
         response.raise_for_status()
         return response
 
-    @kitty_endpoint("/entries/")
+    @kitty_endpoint("/entries/", coalesce=True)
     def get_users(self, **kwargs) -> Dict[str, str]:
         response = self._request(kwargs.pop("method"), kwargs.pop("path"))
         user_parser = kitty_parser.KittySplitUserParser()
         user_parser.feed(response.text)
         return {name: id for id, name in user_parser.usernames}
 
-    @kitty_endpoint("/parties/set/", method="POST", csrf_protected=True)
-    def select_user(self, username: str, **kwargs) -> None:
-        # set selected_viewing_party_id
-        self.selected_viewing_party_id = self.available_users.get(username)
-        if self.selected_viewing_party_id is None:
-            raise ValueError(f"{username} not available!")
+    def select_user(self, username: str) -> None:
+        if self._bound_username not in (None, username):
+            raise ValueError(f"Client is bound to {self._bound_username}!")
+
+        with self._lock:
+            if username not in self.available_users and self.session_store is not None:
+                # the restored users might be outdated
+                self.available_users = self.get_users()
+
+            # set selected_viewing_party_id
+            self.selected_viewing_party_id = self.available_users.get(username)
+            if self.selected_viewing_party_id is None:
+                raise ValueError(f"{username} not available!")
+
+            # switching is only needed if the server is not viewing as this party already
+            if self.server_viewing_party_id != self.selected_viewing_party_id:
+                self._set_viewing_party(self.selected_viewing_party_id)
+            self._save_session_state()
+
+    @contextmanager
+    def as_user(self, username: str) -> Iterator["KittySplitAPI"]:
+        """Yields a client bound to `username` with its own session.
+
+        The client is created on first use and reused afterwards, so switching
+        between users does not cause requests.
+
+        Example:
+            with api.as_user("user1") as user1_api:
+                user1_api.add_expense(amount="10.00", description="Lunch")
+        """
+        root = self._root
+        with root._lock:
+            lane = root._lanes.get(username)
+
+        if lane is None:
+            lane = root._create_lane(username)
+            with root._lock:
+                lane = root._lanes.setdefault(username, lane)
+
+        yield lane
+
+    def _create_lane(self, username: str) -> "KittySplitAPI":
+        lane = copy.copy(self)
+        lane.session = self.transport.configure_session(requests.Session())
+        lane.session_store = None
+        lane.csrf_token = None
+        lane.selected_viewing_party_id = None
+        lane.server_viewing_party_id = None
+        lane._lock = threading.RLock()
+        lane.select_user(username)
+        lane._bound_username = username
+        return lane
 
+    @kitty_endpoint("/parties/set/", method="POST", csrf_protected=True)
+    def _set_viewing_party(self, viewing_party_id: str, **kwargs) -> None:
         form_data = {
-            "viewing_party_id": self.selected_viewing_party_id,
+            "viewing_party_id": viewing_party_id,
         }
 
         # Select party
@@ -115,24 +300,48 @@ class KittySplitAPI:
             csrf_token=kwargs.pop("csrf_token"),
             data=form_data,
         )
+        self.server_viewing_party_id = viewing_party_id
 
-    @kitty_endpoint("/entries/", user_needs_to_be_selected=True)
     def get_expenses(
         self,
         expense_type: kitty_parser.ExpenseType = kitty_parser.ExpenseType.ALL,
-        **kwargs,
+        strict: bool = False,
     ) -> List[dict]:
-        response = self._request(kwargs.pop("method"), kwargs.pop("path"))
-        expenses = kitty_parser.parse_expenses(response.text, expense_type=expense_type)
+        return self.get_expenses_result(expense_type, strict=strict).entries
+
+    @kitty_endpoint("/entries/", user_needs_to_be_selected=True, coalesce=True)
+    def get_expenses_result(
+        self,
+        expense_type: kitty_parser.ExpenseType = kitty_parser.ExpenseType.ALL,
+        strict: bool = False,
+        **kwargs,
+    ) -> kitty_parser.ParseResult:
+        """Like `get_expenses`, but also returns the entries that could not be parsed."""
+        method, path = kwargs.pop("method"), kwargs.pop("path")
+        response = self._request(method, path)
+        self._track_viewing_party(response.text)
+        if self.server_viewing_party_id != self.selected_viewing_party_id:
+            # the page was rendered for another party, switch back and fetch again
+            self._set_viewing_party(self.selected_viewing_party_id)
+            response = self._request(method, path)
+
+        if self.parsing_executor is not None:
+            result = self.parsing_executor.parse_expenses(
+                response.content, expense_type=expense_type, strict=strict
+            )
+        else:
+            result = kitty_parser.parse_expenses_result(
+                response.text, expense_type=expense_type, strict=strict
+            )
 
         # add base url to detail expense pages
-        for expense in expenses:
+        for expense in result.entries:
             detail_url = expense["url"]
             if detail_url.startswith("/"):  # remove leading slash
                 detail_url = detail_url[1:]
             expense["url"] = self.base_url + detail_url
 
-        return expenses
+        return result
 
     @kitty_endpoint("/entries/{}/edit", user_needs_to_be_selected=True)
     def get_expense(self, entry_id: str, **kwargs) -> dict:
@@ -143,6 +352,26 @@ class KittySplitAPI:
         parsed_flat_expense_detail = kitty_parser.parse_expense(response.text)
         return kitty_parser.parse_flat_expense_detail(parsed_flat_expense_detail)
 
+    @kitty_endpoint("/entries/{}/edit", user_needs_to_be_selected=True)
+    def get_expense_details(
+        self, entry_ids: Sequence[str], max_workers: int = 4, **kwargs
+    ) -> List[dict]:
+        """Fetches the details of several expenses.
+
+        The pages are fetched by `max_workers` threads and parsed by the parsing
+        executor of the client, if it has one.
+        """
+        method, path = kwargs.pop("method"), kwargs.pop("path")
+
+        def fetch(entry_id: str) -> bytes:
+            return self._request(method, fill_query_params(path, entry_id)).content
+
+        with ThreadPoolExecutor(max_workers=max_workers) as fetch_executor:
+            pages = list(fetch_executor.map(fetch, entry_ids))
+
+        parsing_executor = self.parsing_executor or ParsingExecutor(max_workers=1)
+        return parsing_executor.parse_expense_details(pages)
+
     @kitty_endpoint(
         "/entries/{}/delete",
         method="POST",
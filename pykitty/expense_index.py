@@ -0,0 +1,206 @@
+import re
+from bisect import bisect_left, bisect_right
+from collections import defaultdict
+from datetime import date, datetime
+from decimal import Decimal
+from typing import Any, Dict, Iterable, List, Set, Union
+
+_TOKEN_PATTERN = re.compile(r"\w+")
+_PARTICIPANTS_SEPARATOR_PATTERN = re.compile(r"\s*,\s*|\s+(?:and|und)\s+")
+
+
+def tokenize(text: str) -> Set[str]:
+    return {token.lower() for token in _TOKEN_PATTERN.findall(text)}
+
+
+def split_participants(participants: str) -> List[str]:
+    return [
+        participant.strip()
+        for participant in _PARTICIPANTS_SEPARATOR_PATTERN.split(participants)
+        if participant.strip()
+    ]
+
+
+def _to_datetime(value: Union[date, datetime]) -> datetime:
+    if isinstance(value, datetime):
+        return value
+    return datetime(value.year, value.month, value.day)
+
+
+def _in_range(value: Any, low: Any, high: Any) -> bool:
+    return (low is None or low <= value) and (high is None or value <= high)
+
+
+class _SortedIndex:
+    """Expense ids sorted by a key, for range lookups by bisection."""
+
+    def __init__(self) -> None:
+        self._keys: List[Any] = []
+        self._ids: List[str] = []
+
+    def insert(self, key: Any, expense_id: str) -> None:
+        position = bisect_right(self._keys, key)
+        self._keys.insert(position, key)
+        self._ids.insert(position, expense_id)
+
+    def remove(self, key: Any, expense_id: str) -> None:
+        start = bisect_left(self._keys, key)
+        end = bisect_right(self._keys, key)
+        position = self._ids.index(expense_id, start, end)
+        del self._keys[position]
+        del self._ids[position]
+
+    def range(self, low: Any = None, high: Any = None) -> Set[str]:
+        start = 0 if low is None else bisect_left(self._keys, low)
+        end = len(self._keys) if high is None else bisect_right(self._keys, high)
+        return set(self._ids[start:end])
+
+
+class ExpenseIndex:
+    """In-memory index over expenses as returned by `KittySplitAPI.get_expenses`.
+
+    Expenses are indexed by date and amount (sorted), buyer, participants, id and
+    description tokens (hashed), so that queries do not scan all expenses. Use
+    `remove` after deleting an expense. `KittySplitAPI.add_expense` does not
+    return the created expense, so pass it to `add` once it was fetched again.
+
+    Example:
+        index = ExpenseIndex(api.get_expenses())
+        index.query(buyer="user1", date_from=date(2023, 3, 1), date_to=date(2023, 3, 31), min_amount=50, text="Aral")
+    """
+
+    def __init__(self, expenses: Iterable[dict] = ()) -> None:
+        self._expenses: Dict[str, dict] = {}
+        self._dates = _SortedIndex()
+        self._amounts = _SortedIndex()
+        self._buyers: Dict[str, Set[str]] = defaultdict(set)
+        self._participants: Dict[str, Set[str]] = defaultdict(set)
+        self._tokens: Dict[str, Set[str]] = defaultdict(set)
+
+        for expense in expenses:
+            self.add(expense)
+
+    def __len__(self) -> int:
+        return len(self._expenses)
+
+    def __contains__(self, expense_id: str) -> bool:
+        return expense_id in self._expenses
+
+    def get(self, expense_id: str) -> Union[dict, None]:
+        return self._expenses.get(expense_id)
+
+    def add(self, expense: dict) -> None:
+        expense_id = expense["id"]
+        if expense_id in self._expenses:
+            self.remove(expense_id)
+
+        self._expenses[expense_id] = expense
+        self._dates.insert(expense["date"], expense_id)
+        self._amounts.insert(Decimal(expense["price"]["amount"]), expense_id)
+        self._buyers[expense["buyer"]].add(expense_id)
+        for participant in self._participant_keys(expense):
+            self._participants[participant].add(expense_id)
+        for token in tokenize(expense["description"]):
+            self._tokens[token].add(expense_id)
+
+    def remove(self, expense_id: str) -> dict:
+        expense = self._expenses.pop(expense_id)
+        self._dates.remove(expense["date"], expense_id)
+        self._amounts.remove(Decimal(expense["price"]["amount"]), expense_id)
+        self._discard(self._buyers, expense["buyer"], expense_id)
+        for participant in self._participant_keys(expense):
+            self._discard(self._participants, participant, expense_id)
+        for token in tokenize(expense["description"]):
+            self._discard(self._tokens, token, expense_id)
+        return expense
+
+    @staticmethod
+    def _participant_keys(expense: dict) -> List[str]:
+        if expense["participants"] == "all":
+            return ["all"]
+        return split_participants(expense["participants"])
+
+    @staticmethod
+    def _discard(index: Dict[str, Set[str]], key: str, expense_id: str) -> None:
+        ids = index.get(key)
+        if ids is None:
+            return
+        ids.discard(expense_id)
+        if not ids:
+            del index[key]
+
+    def query(
+        self,
+        buyer: Union[str, None] = None,
+        participant: Union[str, None] = None,
+        date_from: Union[date, datetime, None] = None,
+        date_to: Union[date, datetime, None] = None,
+        min_amount: Union[Decimal, float, str, None] = None,
+        max_amount: Union[Decimal, float, str, None] = None,
+        text: Union[str, None] = None,
+    ) -> List[dict]:
+        """Returns the expenses matching all given filters, ordered by date.
+
+        Args:
+            buyer (str, optional): The username of the buyer.
+            participant (str, optional): A username involved in the expense, expenses for everyone match every participant.
+            date_from (Union[date, datetime], optional): The earliest date, inclusive.
+            date_to (Union[date, datetime], optional): The latest date, inclusive.
+            min_amount (Union[Decimal, float, str], optional): The minimum amount, inclusive.
+            max_amount (Union[Decimal, float, str], optional): The maximum amount, inclusive.
+            text (str, optional): Words that all have to be in the description, case insensitive.
+
+        Returns:
+            List[dict]: The matching expenses.
+        """
+        low_date = _to_datetime(date_from) if date_from is not None else None
+        high_date = _to_datetime(date_to) if date_to is not None else None
+        low_amount = Decimal(str(min_amount)) if min_amount is not None else None
+        high_amount = Decimal(str(max_amount)) if max_amount is not None else None
+
+        # equality filters are answered from the hash indexes
+        candidates: List[Set[str]] = []
+        if buyer is not None:
+            candidates.append(self._buyers.get(buyer, set()))
+        if participant is not None:
+            candidates.append(
+                self._participants.get(participant, set())
+                | self._participants.get("all", set())
+            )
+        if text is not None:
+            tokens = tokenize(text)
+            candidates.extend(self._tokens.get(token, set()) for token in tokens)
+            if not tokens:
+                candidates.append(set())  # text without words matches nothing
+
+        # without equality filters, the candidates come from a sorted index
+        check_dates = low_date is not None or high_date is not None
+        check_amounts = low_amount is not None or high_amount is not None
+        if not candidates:
+            if check_dates:
+                candidates.append(self._dates.range(low_date, high_date))
+                check_dates = False
+            elif check_amounts:
+                candidates.append(self._amounts.range(low_amount, high_amount))
+                check_amounts = False
+            else:
+                candidates.append(set(self._expenses))
+
+        # intersect starting with the smallest set to keep the work small
+        candidates.sort(key=len)
+        expense_ids = set(candidates[0])
+        for ids in candidates[1:]:
+            expense_ids &= ids
+
+        expenses = []
+        for expense_id in expense_ids:
+            expense = self._expenses[expense_id]
+            if check_dates and not _in_range(expense["date"], low_date, high_date):
+                continue
+            if check_amounts and not _in_range(
+                Decimal(expense["price"]["amount"]), low_amount, high_amount
+            ):
+                continue
+            expenses.append(expense)
+
+        return sorted(expenses, key=lambda expense: (expense["date"], expense["id"]))
@@ -1,12 +1,15 @@
+import logging
 import re
 from datetime import datetime
 from enum import Enum
 from html.parser import HTMLParser
-from typing import List, Tuple, Union
+from typing import Dict, List, NamedTuple, Sequence, Tuple, Union
 from urllib.parse import urlparse
 
 from bs4 import BeautifulSoup
 
+logger = logging.getLogger(__name__)
+
 
 class ExpenseType(str, Enum):
     ALL = "all"
@@ -25,6 +28,90 @@ def parse_kitty_date_string(date_str):
     raise ValueError(f"Date {date_str} is not in a recognized format.")
 
 
+class KittyLocale:
+    """Phrases, number and date formats of a Kittysplit language.
+
+    Args:
+        name (str): The name of the locale, e.g. "de".
+        paid_phrase (str): The verb between buyer and amount, e.g. "hat".
+        for_phrase (str): The word between amount and description, e.g. "für".
+        everyone_phrases (Sequence[str]): The participant texts meaning everyone, e.g. ["Alle."].
+        date_formats (Sequence[str]): The date formats used for the entries, the first one that matches a page is used for all entries of the page.
+        decimal_separator (str, optional): Defaults to ".".
+        thousands_separator (str, optional): Defaults to ",".
+        description_suffix (str, optional): Text following the description, e.g. " bezahlt.". Defaults to "".
+    """
+
+    def __init__(
+        self,
+        name: str,
+        paid_phrase: str,
+        for_phrase: str,
+        everyone_phrases: Sequence[str],
+        date_formats: Sequence[str],
+        decimal_separator: str = ".",
+        thousands_separator: str = ",",
+        description_suffix: str = "",
+    ) -> None:
+        self.name = name
+        self.everyone_phrases = frozenset(everyone_phrases)
+        self.date_formats = tuple(date_formats)
+        self.decimal_separator = decimal_separator
+        self.thousands_separator = thousands_separator
+        self.description_suffix = description_suffix
+        self.expense_pattern = re.compile(
+            rf"^(?P<buyer>.*) {re.escape(paid_phrase)} "
+            r"(?P<currency>[^\d\s.,-]*)\s?(?P<amount>-?[\d.,]*\d) "
+            rf"{re.escape(for_phrase)} (?P<description>.*)"
+        )
+
+    def parse_number(self, number: str) -> str:
+        return (
+            number.strip()
+            .replace(self.thousands_separator, "")
+            .replace(self.decimal_separator, ".")
+        )
+
+    def detect_date_format(self, date_str: str) -> Union[str, None]:
+        for date_format in self.date_formats:
+            try:
+                datetime.strptime(date_str, date_format)
+                return date_format
+            except ValueError:
+                continue
+        return None
+
+
+LOCALES: Dict[str, KittyLocale] = {
+    "de": KittyLocale(
+        "de",
+        paid_phrase="hat",
+        for_phrase="für",
+        everyone_phrases=["Alle."],
+        date_formats=["%d.%m.%Y", "%Y-%m-%d"],
+        decimal_separator=",",
+        thousands_separator=".",
+        description_suffix=" bezahlt.",
+    ),
+    "en": KittyLocale(
+        "en",
+        paid_phrase="paid",
+        for_phrase="for",
+        everyone_phrases=["everyone."],
+        date_formats=["%m/%d/%Y", "%Y-%m-%d"],
+    ),
+}
+
+_NUMBER_PATTERN = re.compile(r"-?[\d.,]*\d")
+
+
+def detect_locale(entry_info: str) -> Union[KittyLocale, None]:
+    for kitty_locale in LOCALES.values():
+        if kitty_locale.expense_pattern.search(entry_info):
+            return kitty_locale
+    return None
+
+
 class CSRFHTMLParser(HTMLParser):
     def __init__(self):
         super().__init__()
@@ -71,6 +158,60 @@ class KittySplitUserParser(HTMLParser):
             self.in_form = False
 
 
+_ENTRY_PATTERN = re.compile(
+    r"<li[^>]*class=\"[^\"]*\bentry-list-item\b[^\"]*\"[^>]*>.*?</li>", re.DOTALL
+)
+_OWN_ENTRY_PATTERN = re.compile(
+    r"<li[^>]*class=\"[^\"]*\bentry-yours\b[^\"]*\"[^>]*>.*?</li>", re.DOTALL
+)
+
+
+def _first_entry_link(html: str, entry_pattern: "re.Pattern[str]"):
+    # only the first matching entry is parsed, the page can be large
+    entry = entry_pattern.search(html)
+    if entry is None:
+        return None
+    return BeautifulSoup(entry.group(), "html.parser").find("a", class_="entry-link")
+
+
+def parse_viewing_party_name(html: str) -> Union[str, None]:
+    """Returns the name of the party an entries page was rendered for.
+
+    The page marks the expenses paid by the viewing party as `entry-yours`, so the
+    buyer of such an expense is the viewing party. Returns None if the viewing
+    party paid none of the listed expenses, e.g. on a page rendered without a
+    selected party, or if the locale of the expense is unknown.
+    """
+    entry_link = _first_entry_link(html, _OWN_ENTRY_PATTERN)
+    if entry_link is None:
+        return None
+    entry_info = entry_link.find("div", class_="col-xs-11").text.strip()
+    kitty_locale = detect_locale(entry_info)
+    if kitty_locale is None:
+        return None
+    expense_pattern = kitty_locale.expense_pattern.search(entry_info)
+    return expense_pattern.group("buyer").strip() if expense_pattern else None
+
+
+def detect_page_format(html: str) -> Tuple[Union[str, None], Union[str, None]]:
+    """Returns the locale and date format of an entries page, from its first entry.
+
+    Either is None if it can not be detected.
+    """
+    entry_link = _first_entry_link(html, _ENTRY_PATTERN)
+    if entry_link is None:
+        return None, None
+    kitty_locale = detect_locale(
+        entry_link.find("div", class_="col-xs-11").text.strip()
+    )
+    if kitty_locale is None:
+        return None, None
+    date_label = entry_link.find("span", class_="entry-label entry-label-date")
+    if date_label is None:
+        return kitty_locale.name, None
+    return kitty_locale.name, kitty_locale.detect_date_format(date_label.text.strip())
+
+
 def parse_expense(html: str) -> dict:
     soup = BeautifulSoup(html, "html.parser")
     form = soup.find("form", attrs={"class": "edit-entry-form"})
@@ -224,9 +365,83 @@ def get_expense_id_from_url(url: str) -> str:
     return entry_id
 
 
-def parse_expenses(html: str, expense_type: ExpenseType) -> List[dict]:
+class SkippedEntry(NamedTuple):
+    position: int  # index of the entry in the page
+    raw_text: str
+    reason: str
+
+
+class ExpenseParseError(ValueError):
+    def __init__(self, skipped_entry: SkippedEntry) -> None:
+        super().__init__(
+            f"Could not parse entry {skipped_entry.position} "
+            f"({skipped_entry.reason}): {skipped_entry.raw_text}"
+        )
+        self.skipped_entry = skipped_entry
+
+    def __reduce__(self):
+        # keeps the error intact when it is sent back from a worker process
+        return type(self), (self.skipped_entry,)
+
+
+class ParseResult:
+    """The parsed expenses of a page and the entries that could not be parsed."""
+
+    def __init__(
+        self,
+        entries: List[dict],
+        skipped: List[SkippedEntry],
+        locale: Union[str, None] = None,
+    ) -> None:
+        self.entries = entries
+        self.skipped = skipped
+        self.locale = locale
+
+    @property
+    def parsed_count(self) -> int:
+        return len(self.entries)
+
+    @property
+    def skipped_count(self) -> int:
+        return len(self.skipped)
+
+    def __repr__(self) -> str:
+        return (
+            f"ParseResult(parsed={self.parsed_count}, skipped={self.skipped_count}, "
+            f"locale={self.locale!r})"
+        )
+
+
+def parse_expenses(
+    html: str, expense_type: ExpenseType, locale: Union[str, None] = None
+) -> List[dict]:
+    return parse_expenses_result(html, expense_type, locale=locale).entries
+
+
+def parse_expenses_result(
+    html: str,
+    expense_type: ExpenseType,
+    locale: Union[str, None] = None,
+    strict: bool = False,
+    date_format: Union[str, None] = None,
+    log: bool = True,
+) -> ParseResult:
+    """Parses the expenses of an entries page.
+
+    Args:
+        html (str): The html of the entries page.
+        expense_type (ExpenseType): The expenses to parse.
+        locale (Union[str, None], optional): The locale of the page, one of LOCALES. Defaults to None, which detects the locale.
+        strict (bool, optional): Raise an ExpenseParseError for the first entry that can not be parsed instead of skipping it. Defaults to False.
+        date_format (Union[str, None], optional): The strptime format of the dates. Defaults to None, which detects the format.
+        log (bool, optional): Log how many entries were skipped. Defaults to True.
+
+    Returns:
+        ParseResult: The parsed expenses and the skipped entries.
+    """
     soup = BeautifulSoup(html, "html.parser")
     entries = []
+    skipped = []
 
     # construct the class filter based on the expense type
     expense_class_filter = "py-1 entry-list-item entry-all"
@@ -239,50 +454,105 @@ def parse_expenses(html: str, expense_type: ExpenseType) -> List[dict]:
     else:
         raise ValueError(f"Invalid expense type: {expense_type}")
 
-    for li in soup.find_all("li", class_=re.compile(expense_class_filter)):
-        entry = {}
-        entry_link = li.find("a", class_="entry-link")
-        entry["url"] = entry_link["href"]
-        entry["id"] = get_expense_id_from_url(entry["url"])
+    # the locale and date format are detected once and used for the whole page
+    kitty_locale = LOCALES[locale] if locale is not None else None
 
+    for position, li in enumerate(
+        soup.find_all("li", class_=re.compile(expense_class_filter))
+    ):
+        entry_link = li.find("a", class_="entry-link")
         entry_info = entry_link.find("div", class_="col-xs-11").text.strip()
-        expense_pattern = re.search(
-            r"^(.*) (?:paid|hat) €(.*?) (?:for|für) (.*)", entry_info
-        )
-        if not expense_pattern:
-            print(f"Could not parse entry: {entry_info}")
-            continue
-        buyer, amount, description = expense_pattern.groups()
-        entry["buyer"] = buyer.strip()
-        entry["price"] = {"currency": "€", "amount": amount.replace(",", ".").strip()}
-        entry["description"] = description.replace(" bezahlt.", "").strip()
-
-        date_text = entry_link.find(
-            "span", class_="entry-label entry-label-date"
-        ).text.strip()
-        entry["date"] = parse_kitty_date_string(date_text)
-
-        share_text = entry_link.find(
-            "span", class_="entry-label entry-label-share accent-color-primary"
-        )
-        if share_text:
-            entry["share"] = (
-                share_text.text.strip()
-                .split(": ")[1]
-                .replace("€", "")
-                .replace(",", ".")
-                .strip()
-            )
-
-        participants_text = entry_link.find(
-            "span", class_="entry-label entry-label-parties"
-        ).text.strip()
-        participants = participants_text.split(": ")[1]
-        if participants in ["Alle.", "everyone."]:
-            entry["participants"] = "all"
+        if kitty_locale is None:
+            kitty_locale = detect_locale(entry_info)
+
+        reason = None
+        if kitty_locale is None:
+            reason = "unknown locale"
         else:
-            entry["participants"] = participants_text.split(": ")[1].strip(".")
+            try:
+                entry, date_format = _parse_entry(
+                    entry_link, entry_info, kitty_locale, date_format
+                )
+            except (AttributeError, IndexError, KeyError, TypeError, ValueError) as e:
+                reason = f"{type(e).__name__}: {e}"
+
+        if reason is not None:
+            skipped_entry = SkippedEntry(position, entry_info, reason)
+            if strict:
+                raise ExpenseParseError(skipped_entry)
+            skipped.append(skipped_entry)
+            continue
 
         entries.append(entry)
 
-    return entries
+    result = ParseResult(
+        entries, skipped, locale=kitty_locale.name if kitty_locale else None
+    )
+    if log:
+        log_parse_result(result)
+    return result
+
+
+def log_parse_result(result: ParseResult) -> None:
+    if result.skipped:
+        logger.warning(
+            "Skipped %d of %d entries",
+            result.skipped_count,
+            result.parsed_count + result.skipped_count,
+        )
+    logger.debug("Parsed %r", result)
+
+
+def _parse_entry(
+    entry_link,
+    entry_info: str,
+    kitty_locale: KittyLocale,
+    date_format: Union[str, None],
+) -> Tuple[dict, Union[str, None]]:
+    entry = {}
+    entry["url"] = entry_link["href"]
+    entry["id"] = get_expense_id_from_url(entry["url"])
+
+    expense_pattern = kitty_locale.expense_pattern.search(entry_info)
+    if not expense_pattern:
+        raise ValueError(f"no {kitty_locale.name} expense phrase")
+    entry["buyer"] = expense_pattern.group("buyer").strip()
+    entry["price"] = {
+        "currency": expense_pattern.group("currency") or "€",
+        "amount": kitty_locale.parse_number(expense_pattern.group("amount")),
+    }
+    description = expense_pattern.group("description")
+    if kitty_locale.description_suffix and description.endswith(
+        kitty_locale.description_suffix
+    ):
+        description = description[: -len(kitty_locale.description_suffix)]
+    entry["description"] = description.strip()
+
+    date_text = entry_link.find(
+        "span", class_="entry-label entry-label-date"
+    ).text.strip()
+    if date_format is None:
+        date_format = kitty_locale.detect_date_format(date_text)
+    entry["date"] = (
+        datetime.strptime(date_text, date_format)
+        if date_format is not None
+        else parse_kitty_date_string(date_text)
+    )
+
+    share_text = entry_link.find(
+        "span", class_="entry-label entry-label-share accent-color-primary"
+    )
+    if share_text:
+        share = _NUMBER_PATTERN.search(share_text.text.strip().split(": ")[1])
+        entry["share"] = kitty_locale.parse_number(share.group())
+
+    participants_text = entry_link.find(
+        "span", class_="entry-label entry-label-parties"
+    ).text.strip()
+    participants = participants_text.split(": ")[1]
+    if participants in kitty_locale.everyone_phrases:
+        entry["participants"] = "all"
+    else:
+        entry["participants"] = participants.strip(".")
+
+    return entry, date_format
@@ -0,0 +1,150 @@
+import os
+import re
+import threading
+from concurrent.futures import ProcessPoolExecutor
+from typing import List, Sequence, Tuple, Union
+
+from pykitty import kitty_parser
+
+# start of an entry in the entries page, the page is split in front of these
+_ENTRY_START_PATTERN = re.compile(r"<li\b[^>]*\bentry-list-item\b")
+
+
+def _decode(html: Union[bytes, str]) -> str:
+    return html.decode("utf-8") if isinstance(html, bytes) else html
+
+
+def parse_expense_detail(html: Union[bytes, str]) -> dict:
+    return kitty_parser.parse_flat_expense_detail(
+        kitty_parser.parse_expense(_decode(html))
+    )
+
+
+def _parse_expenses_chunk(
+    args: Tuple[str, kitty_parser.ExpenseType, Union[str, None], Union[str, None], bool]
+) -> kitty_parser.ParseResult:
+    html, expense_type, locale, date_format, strict = args
+    # the merged result of the page is logged by the parent
+    return kitty_parser.parse_expenses_result(
+        html,
+        expense_type,
+        locale=locale,
+        strict=strict,
+        date_format=date_format,
+        log=False,
+    )
+
+
+def split_entries_page(html: str, number_of_chunks: int) -> List[str]:
+    """Splits an entries page into chunks of whole entries."""
+    starts = [match.start() for match in _ENTRY_START_PATTERN.finditer(html)]
+    if len(starts) < 2 or number_of_chunks < 2:
+        return [html]
+
+    entries_per_chunk = -(-len(starts) // number_of_chunks)  # ceil division
+    chunk_starts = starts[::entries_per_chunk] + [len(html)]
+    return [html[start:end] for start, end in zip(chunk_starts[:-1], chunk_starts[1:])]
+
+
+class ParsingExecutor:
+    """Parses pages in a pool of processes, so that parsing is not bound to one core.
+
+    Inputs below `min_parallel_bytes` are parsed in-process, as sending them to a
+    worker costs more than parsing them. On platforms that spawn processes, the
+    executor must be used from a `if __name__ == "__main__":` guarded script.
+
+    Args:
+        max_workers (Union[int, None], optional): The number of worker processes. Defaults to the number of cores.
+        min_parallel_bytes (int, optional): The size of the input from which on the pool is used. Defaults to 512 KiB.
+        chunks_per_worker (int, optional): Into how many chunks per worker the input is split. Defaults to 4.
+    """
+
+    def __init__(
+        self,
+        max_workers: Union[int, None] = None,
+        min_parallel_bytes: int = 512 * 1024,
+        chunks_per_worker: int = 4,
+    ) -> None:
+        self.max_workers = max_workers or os.cpu_count() or 1
+        self.min_parallel_bytes = min_parallel_bytes
+        self.chunks_per_worker = chunks_per_worker
+        self._pool: Union[ProcessPoolExecutor, None] = None
+        self._pool_lock = threading.Lock()
+
+    @property
+    def pool(self) -> ProcessPoolExecutor:
+        # started on first use, so that small workloads never spawn processes
+        with self._pool_lock:
+            if self._pool is None:
+                self._pool = ProcessPoolExecutor(max_workers=self.max_workers)
+            return self._pool
+
+    def _use_pool(self, number_of_bytes: int) -> bool:
+        return self.max_workers > 1 and number_of_bytes >= self.min_parallel_bytes
+
+    def parse_expense_details(self, pages: Sequence[Union[bytes, str]]) -> List[dict]:
+        """Parses `/entries/{id}/edit` pages into nested expense details."""
+        if len(pages) < 2 or not self._use_pool(sum(len(page) for page in pages)):
+            return [parse_expense_detail(page) for page in pages]
+
+        chunksize = max(1, len(pages) // (self.max_workers * self.chunks_per_worker))
+        return list(self.pool.map(parse_expense_detail, pages, chunksize=chunksize))
+
+    def parse_expenses(
+        self,
+        html: Union[bytes, str],
+        expense_type: kitty_parser.ExpenseType,
+        locale: Union[str, None] = None,
+        strict: bool = False,
+    ) -> kitty_parser.ParseResult:
+        """Parses an entries page, see `kitty_parser.parse_expenses_result`."""
+        html = _decode(html)
+        if not self._use_pool(len(html)):
+            return kitty_parser.parse_expenses_result(
+                html, expense_type, locale=locale, strict=strict
+            )
+
+        # the locale and date format are detected once for the whole page
+        detected_locale, date_format = kitty_parser.detect_page_format(html)
+        locale = locale or detected_locale
+        chunks = split_entries_page(html, self.max_workers * self.chunks_per_worker)
+        results = self.pool.map(
+            _parse_expenses_chunk,
+            [(chunk, expense_type, locale, date_format, strict) for chunk in chunks],
+        )
+
+        # merge the chunks, positions of skipped entries are relative to their chunk
+        entries, skipped, offset = [], [], 0
+        while True:
+            try:
+                result = next(results)
+            except StopIteration:
+                break
+            except kitty_parser.ExpenseParseError as error:
+                skipped_entry = error.skipped_entry
+                raise kitty_parser.ExpenseParseError(
+                    skipped_entry._replace(position=skipped_entry.position + offset)
+                ) from None
+            entries.extend(result.entries)
+            skipped.extend(
+                entry._replace(position=entry.position + offset)
+                for entry in result.skipped
+            )
+            locale = locale or result.locale
+            offset += result.parsed_count + result.skipped_count
+
+        result = kitty_parser.ParseResult(entries, skipped, locale=locale)
+        kitty_parser.log_parse_result(result)
+        return result
+
+    def shutdown(self) -> None:
+        with self._pool_lock:
+            if self._pool is not None:
+                self._pool.shutdown()
+                self._pool = None
+
+    def __enter__(self) -> "ParsingExecutor":
+        return self
+
+    def __exit__(self, *exc_info) -> None:
+        self.shutdown()
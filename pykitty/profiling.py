@@ -0,0 +1,130 @@
+import cProfile
+import os
+import sys
+import threading
+import time
+from collections import Counter, defaultdict
+from contextlib import contextmanager
+from typing import Dict, Iterator, List, Tuple, Union
+
+UNATTRIBUTED_PHASE = "(unattributed)"
+
+
+class PhaseProfiler:
+    """Breaks the wall time of a run down by named, possibly nested, phases.
+
+    Optionally records a cProfile of the run and samples the stacks of the
+    profiled thread into a collapsed-stack file, which can be turned into a
+    flame graph with e.g. `flamegraph.pl` or speedscope.
+
+    Example:
+        profiler = PhaseProfiler(collapsed_path="run.folded")
+        profiler.start()
+        with profiler.phase("csv"):
+            ...
+        profiler.stop()
+
+    Args:
+        stats_path (str, optional): Where to dump the pstats file of the run. Defaults to None.
+        collapsed_path (str, optional): Where to write the collapsed stacks of the run. Defaults to None.
+        sample_interval (float, optional): Seconds between two stack samples. Defaults to 0.005.
+    """
+
+    def __init__(
+        self,
+        stats_path: Union[str, os.PathLike, None] = None,
+        collapsed_path: Union[str, os.PathLike, None] = None,
+        sample_interval: float = 0.005,
+    ) -> None:
+        self.stats_path = stats_path
+        self.collapsed_path = collapsed_path
+        self.sample_interval = sample_interval
+        self.totals: Dict[Tuple[str, ...], float] = defaultdict(float)
+        self.counts: Dict[Tuple[str, ...], int] = defaultdict(int)
+        self._order: Dict[Tuple[str, ...], int] = {}  # phases in order of first use
+        self.wall_time = 0.0
+        self._phases: Dict[int, List[str]] = defaultdict(list)  # thread id -> phases
+        self._started_at: Union[float, None] = None
+        self._profile: Union[cProfile.Profile, None] = None
+        self._samples: Counter = Counter()
+        self._sampler: Union[threading.Thread, None] = None
+        self._stop_sampling = threading.Event()
+
+    @contextmanager
+    def phase(self, name: str) -> Iterator[None]:
+        phases = self._phases[threading.get_ident()]
+        phases.append(name)
+        path = tuple(phases)
+        self._order.setdefault(path, len(self._order))
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.totals[path] += time.perf_counter() - start
+            self.counts[path] += 1
+            phases.pop()
+
+    def start(self) -> None:
+        self._started_at = time.perf_counter()
+        if self.stats_path is not None:
+            self._profile = cProfile.Profile()
+            self._profile.enable()
+        if self.collapsed_path is not None:
+            self._sampler = threading.Thread(
+                target=self._sample, args=(threading.get_ident(),), daemon=True
+            )
+            self._sampler.start()
+
+    def stop(self) -> None:
+        self.wall_time = time.perf_counter() - self._started_at
+        if self._profile is not None:
+            self._profile.disable()
+            self._profile.dump_stats(self.stats_path)
+        if self._sampler is not None:
+            self._stop_sampling.set()
+            self._sampler.join()
+            self._write_collapsed_stacks()
+
+    def _sample(self, thread_id: int) -> None:
+        while not self._stop_sampling.wait(self.sample_interval):
+            frame = sys._current_frames().get(thread_id)
+            if frame is None:
+                return
+
+            stack = []
+            while frame is not None:
+                code = frame.f_code
+                module = os.path.splitext(os.path.basename(code.co_filename))[0]
+                stack.append(f"{module}.{code.co_name}")
+                frame = frame.f_back
+            phases = [f"[{name}]" for name in list(self._phases[thread_id])]
+            self._samples[";".join(phases + stack[::-1])] += 1
+
+    def _write_collapsed_stacks(self) -> None:
+        with open(self.collapsed_path, "w") as collapsed_file:
+            for stack, count in sorted(self._samples.items()):
+                collapsed_file.write(f"{stack} {count}\n")
+
+    def rows(self) -> List[Tuple[str, int, float, float]]:
+        """Returns (phase, count, total seconds, share of the wall time) per phase.
+
+        Nested phases are indented below their parent. The time outside of all
+        phases is reported as an extra phase.
+        """
+        rows = []
+        for path in sorted(self.totals, key=self._sort_key):
+            total = self.totals[path]
+            name = "  " * (len(path) - 1) + path[-1]
+            rows.append((name, self.counts[path], total, self._share(total)))
+
+        attributed = sum(total for path, total in self.totals.items() if len(path) == 1)
+        unattributed = max(self.wall_time - attributed, 0.0)
+        rows.append((UNATTRIBUTED_PHASE, 1, unattributed, self._share(unattributed)))
+        return rows
+
+    def _sort_key(self, path: Tuple[str, ...]) -> Tuple[int, ...]:
+        # children follow their parent, siblings are ordered by first use
+        return tuple(self._order[path[: depth + 1]] for depth in range(len(path)))
+
+    def _share(self, seconds: float) -> float:
+        return seconds / self.wall_time if self.wall_time else 0.0
@@ -0,0 +1,343 @@
+import json
+import logging
+import re
+import threading
+import time
+from datetime import date, datetime
+from decimal import Decimal, InvalidOperation
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from typing import Callable, Dict, List, Tuple, Union
+from urllib.parse import parse_qs, urlparse
+
+import requests
+
+from pykitty import kitty_parser
+from pykitty.client import KittySplitAPI
+from pykitty.expense_index import ExpenseIndex
+
+logger = logging.getLogger(__name__)
+
+
+class RateLimiter:
+    """Spaces calls at least `min_interval` seconds apart."""
+
+    def __init__(self, min_interval: float) -> None:
+        self.min_interval = min_interval
+        self._lock = threading.Lock()
+        self._last_call = 0.0
+
+    def wait(self) -> None:
+        with self._lock:
+            delay = self._last_call + self.min_interval - time.monotonic()
+            if delay > 0:
+                time.sleep(delay)
+            self._last_call = time.monotonic()
+
+
+class KittyCache:
+    """Serves the users and expenses of a kitty from memory, refreshed on an interval.
+
+    The expenses are fetched as `username`. Writes are forwarded one at a time
+    through the rate limiter and trigger an early refresh.
+
+    Args:
+        api (KittySplitAPI): The client of the kitty.
+        username (str): The user the expenses are fetched as.
+        refresh_interval (float, optional): Seconds between two polls of the kitty. Defaults to 60.
+        write_interval (float, optional): Minimum seconds between two writes. Defaults to 0.5.
+    """
+
+    def __init__(
+        self,
+        api: KittySplitAPI,
+        username: str,
+        refresh_interval: float = 60.0,
+        write_interval: float = 0.5,
+    ) -> None:
+        self.api = api
+        self.username = username
+        self.refresh_interval = refresh_interval
+        self.rate_limiter = RateLimiter(write_interval)
+        self.users: Dict[str, str] = {}
+        self.index = ExpenseIndex()
+        self.refreshed_at: Union[datetime, None] = None
+        # the error of the last refresh, None once a refresh succeeded
+        self.refresh_error: Union[str, None] = None
+        self._details: Dict[str, dict] = {}
+        self._lock = threading.Lock()
+        self._write_lock = threading.Lock()
+        self._refresh_requested = threading.Event()
+        self._stopped = threading.Event()
+        self._thread: Union[threading.Thread, None] = None
+
+    def refresh(self) -> None:
+        with self.api.as_user(self.username) as user_api:
+            users = user_api.get_users()
+            index = ExpenseIndex(user_api.get_expenses())
+
+        # swap in the new data at once, readers never see a partial refresh
+        with self._lock:
+            self.users = users
+            self.index = index
+            self._details = {}
+            self.refreshed_at = datetime.now()
+            self.refresh_error = None
+
+    def start(self) -> None:
+        self.refresh()
+        self._thread = threading.Thread(target=self._refresh_loop, daemon=True)
+        self._thread.start()
+
+    def stop(self) -> None:
+        self._stopped.set()
+        self._refresh_requested.set()
+
+    def _refresh_loop(self) -> None:
+        while True:
+            self._refresh_requested.wait(self.refresh_interval)
+            self._refresh_requested.clear()
+            if self._stopped.is_set():
+                return
+            try:
+                self.refresh()
+            except Exception as error:
+                # keep polling, e.g. the user might be added to the kitty again
+                logger.exception("Refreshing %s failed", self.api.kitty_id)
+                with self._lock:
+                    self.refresh_error = f"{type(error).__name__}: {error}"
+
+    def get_expenses(
+        self,
+        expense_type: kitty_parser.ExpenseType = kitty_parser.ExpenseType.ALL,
+        **filters,
+    ) -> List[dict]:
+        with self._lock:
+            expenses = self.index.query(**filters)
+        if expense_type == kitty_parser.ExpenseType.YOURS:
+            expenses = [e for e in expenses if e["buyer"] == self.username]
+        elif expense_type == kitty_parser.ExpenseType.OTHERS:
+            expenses = [e for e in expenses if e["buyer"] != self.username]
+        return expenses
+
+    def get_expense(self, entry_id: str) -> dict:
+        with self._lock:
+            detail = self._details.get(entry_id)
+        if detail is None:
+            with self.api.as_user(self.username) as user_api:
+                detail = user_api.get_expense(entry_id)
+            with self._lock:
+                self._details[entry_id] = detail
+        return detail
+
+    def _write(self, username: str, write: Callable[[KittySplitAPI], None]) -> None:
+        with self._write_lock:
+            self.rate_limiter.wait()
+            with self.api.as_user(username) as user_api:
+                write(user_api)
+        self._refresh_requested.set()
+
+    def add_expense(self, username: str, **expense) -> None:
+        self._write(username, lambda user_api: user_api.add_expense(**expense))
+
+    def delete_expense(self, username: str, entry_id: str) -> None:
+        self._write(username, lambda user_api: user_api.delete_expense(entry_id))
+        with self._lock:
+            if entry_id in self.index:
+                self.index.remove(entry_id)
+            self._details.pop(entry_id, None)
+
+
+def _json_default(value):
+    if isinstance(value, (date, datetime)):
+        return value.isoformat()
+    raise TypeError(f"{type(value).__name__} is not JSON serializable")
+
+
+def _query_filters(query: Dict[str, List[str]]) -> dict:
+    filters = {}
+    for name in ("buyer", "participant", "text"):
+        if name in query:
+            filters[name] = query[name][0]
+    for name in ("min_amount", "max_amount"):
+        if name in query:
+            filters[name] = _parse_amount(name, query[name][0])
+    for name in ("date_from", "date_to"):
+        if name in query:
+            filters[name] = date.fromisoformat(query[name][0])
+    return filters
+
+
+def _parse_amount(name: str, value: str) -> Decimal:
+    try:
+        amount = Decimal(value)
+    except InvalidOperation:
+        raise ValueError(f"Invalid {name} {value!r}") from None
+    if not amount.is_finite():
+        raise ValueError(f"Invalid {name} {value!r}")
+    return amount
+
+
+def _pop_field(body: dict, name: str):
+    if name not in body:
+        raise ValueError(f"Missing field '{name}'")
+    return body.pop(name)
+
+
+class UnknownKittyError(LookupError):
+    """The server serves no kitty of the name."""
+
+
+class KittyRequestHandler(BaseHTTPRequestHandler):
+    """JSON routes over the `kitties` of the server.
+
+    GET    /kitties  -> {name: {"refreshed_at", "refresh_error"}}
+    GET    /kitties/{name}/users
+    GET    /kitties/{name}/expenses?type=&buyer=&participant=&date_from=&date_to=&min_amount=&max_amount=&text=
+    GET    /kitties/{name}/expenses/{id}
+    POST   /kitties/{name}/expenses  {"username", "amount", "description", "entry_date", "weight_mapping"}
+    DELETE /kitties/{name}/expenses/{id}?username=
+    """
+
+    server: "KittyServer"
+
+    _routes: List[Tuple[str, "re.Pattern[str]", str]] = [
+        ("GET", re.compile(r"^/kitties/?$"), "list_kitties"),
+        ("GET", re.compile(r"^/kitties/(?P<name>[^/]+)/users/?$"), "get_users"),
+        (
+            "GET",
+            re.compile(r"^/kitties/(?P<name>[^/]+)/expenses/?$"),
+            "get_expenses",
+        ),
+        (
+            "GET",
+            re.compile(r"^/kitties/(?P<name>[^/]+)/expenses/(?P<entry_id>[^/]+)/?$"),
+            "get_expense",
+        ),
+        (
+            "POST",
+            re.compile(r"^/kitties/(?P<name>[^/]+)/expenses/?$"),
+            "add_expense",
+        ),
+        (
+            "DELETE",
+            re.compile(r"^/kitties/(?P<name>[^/]+)/expenses/(?P<entry_id>[^/]+)/?$"),
+            "delete_expense",
+        ),
+    ]
+
+    def do_GET(self) -> None:
+        self._dispatch("GET")
+
+    def do_POST(self) -> None:
+        self._dispatch("POST")
+
+    def do_DELETE(self) -> None:
+        self._dispatch("DELETE")
+
+    def _dispatch(self, method: str) -> None:
+        url = urlparse(self.path)
+        query = parse_qs(url.query)
+        for route_method, pattern, handler_name in self._routes:
+            match = pattern.match(url.path)
+            if route_method != method or match is None:
+                continue
+
+            params = match.groupdict()
+            try:
+                if "name" in params:
+                    params["cache"] = self._get_cache(params.pop("name"))
+                status, body = getattr(self, handler_name)(query=query, **params)
+            except UnknownKittyError as error:
+                status, body = 404, {"error": str(error)}
+            except (ValueError, TypeError) as error:
+                status, body = 400, {"error": str(error)}
+            except requests.RequestException as error:
+                status, body = 502, {"error": str(error)}
+            except Exception as error:
+                logger.exception("%s %s failed", method, url.path)
+                status, body = 500, {"error": f"{type(error).__name__}: {error}"}
+            return self._send_json(status, body)
+
+        self._send_json(404, {"error": f"No route for {method} {url.path}"})
+
+    def _get_cache(self, name: str) -> KittyCache:
+        if name not in self.server.kitties:
+            raise UnknownKittyError(f"Unknown kitty {name}")
+        return self.server.kitties[name]
+
+    def _read_json(self) -> dict:
+        length = int(self.headers.get("Content-Length", 0))
+        body = json.loads(self.rfile.read(length) or b"{}")
+        if not isinstance(body, dict):
+            raise ValueError("Expected a JSON object")
+        return body
+
+    def _send_json(self, status: int, body) -> None:
+        content = json.dumps(body, default=_json_default).encode()
+        self.send_response(status)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(content)))
+        self.end_headers()
+        self.wfile.write(content)
+
+    def log_message(self, format: str, *args) -> None:
+        logger.info("%s - %s", self.address_string(), format % args)
+
+    def list_kitties(self, query) -> Tuple[int, object]:
+        return 200, {
+            name: {
+                "refreshed_at": cache.refreshed_at,
+                "refresh_error": cache.refresh_error,
+            }
+            for name, cache in self.server.kitties.items()
+        }
+
+    def get_users(self, cache: KittyCache, query) -> Tuple[int, object]:
+        return 200, cache.users
+
+    def get_expenses(self, cache: KittyCache, query) -> Tuple[int, object]:
+        expense_type = kitty_parser.ExpenseType(query.get("type", ["all"])[0])
+        return 200, cache.get_expenses(expense_type, **_query_filters(query))
+
+    def get_expense(
+        self, cache: KittyCache, entry_id: str, query
+    ) -> Tuple[int, object]:
+        return 200, cache.get_expense(entry_id)
+
+    def add_expense(self, cache: KittyCache, query) -> Tuple[int, object]:
+        body = self._read_json()
+        cache.add_expense(
+            _pop_field(body, "username"),
+            amount=str(_pop_field(body, "amount")),
+            description=_pop_field(body, "description"),
+            entry_date=body.pop("entry_date", None),
+            weight_mapping=body.pop("weight_mapping", None),
+        )
+        return 201, {"status": "created"}
+
+    def delete_expense(
+        self, cache: KittyCache, entry_id: str, query
+    ) -> Tuple[int, object]:
+        if "username" not in query:
+            raise ValueError("username is required")
+        cache.delete_expense(query["username"][0], entry_id)
+        return 200, {"status": "deleted"}
+
+
+class KittyServer(ThreadingHTTPServer):
+    daemon_threads = True
+
+    def __init__(
+        self, server_address: Tuple[str, int], kitties: Dict[str, KittyCache]
+    ) -> None:
+        super().__init__(server_address, KittyRequestHandler)
+        self.kitties = kitties
+
+    def start_caches(self) -> None:
+        for cache in self.kitties.values():
+            cache.start()
+
+    def server_close(self) -> None:
+        for cache in self.kitties.values():
+            cache.stop()
+        super().server_close()
@@ -0,0 +1,89 @@
+import hashlib
+import json
+import os
+import time
+from pathlib import Path
+from typing import Dict, List, Union
+
+from requests.cookies import RequestsCookieJar
+
+DEFAULT_SESSION_DIR = Path("~/.cache/pykitty/sessions").expanduser()
+
+
+def dump_cookies(cookie_jar: RequestsCookieJar) -> List[dict]:
+    return [
+        {
+            "name": cookie.name,
+            "value": cookie.value,
+            "domain": cookie.domain,
+            "path": cookie.path,
+            "expires": cookie.expires,
+            "secure": cookie.secure,
+        }
+        for cookie in cookie_jar
+    ]
+
+
+def load_cookies(cookie_jar: RequestsCookieJar, cookies: List[dict]) -> None:
+    for cookie in cookies:
+        cookie_jar.set(**cookie)
+
+
+class SessionStore:
+    """Stores the session state of a kitty on disk, so that it can be reused across runs.
+
+    The state consists of the session cookies, the available users, the selected
+    viewing party and the last CSRF token. It is keyed by the kitty id.
+
+    Args:
+        directory (Union[str, Path, None], optional): The directory the state files are written to. Defaults to "~/.cache/pykitty/sessions".
+        max_age (float, optional): Seconds after which a stored state is considered stale and ignored. Defaults to 12 hours.
+    """
+
+    def __init__(
+        self, directory: Union[str, Path, None] = None, max_age: float = 12 * 60 * 60
+    ) -> None:
+        self.directory = (
+            Path(directory).expanduser()
+            if directory is not None
+            else DEFAULT_SESSION_DIR
+        )
+        self.max_age = max_age
+
+    def _path(self, kitty_id: str) -> Path:
+        # the kitty id grants access to the kitty, so keep it out of the file name
+        digest = hashlib.sha256(kitty_id.encode()).hexdigest()
+        return self.directory / f"{digest}.json"
+
+    def load(self, kitty_id: str) -> Union[Dict, None]:
+        try:
+            with open(self._path(kitty_id)) as state_file:
+                state = json.load(state_file)
+        except (OSError, ValueError):
+            return None
+
+        if not isinstance(state, dict) or state.get("kitty_id") != kitty_id:
+            return None
+        if time.time() - state.get("saved_at", 0) > self.max_age:
+            return None
+        if not state.get("available_users"):
+            return None
+        return state
+
+    def save(self, kitty_id: str, state: Dict) -> None:
+        self.directory.mkdir(parents=True, exist_ok=True)
+        state = dict(state, kitty_id=kitty_id, saved_at=time.time())
+
+        # write to a temporary file first, so that readers never see a partial state
+        path = self._path(kitty_id)
+        tmp_path = path.with_suffix(f".{os.getpid()}.tmp")
+        fd = os.open(tmp_path, os.O_WRONLY | os.O_CREAT | os.O_TRUNC, 0o600)
+        with os.fdopen(fd, "w") as state_file:
+            json.dump(state, state_file)
+        os.replace(tmp_path, path)
+
+    def clear(self, kitty_id: str) -> None:
+        try:
+            self._path(kitty_id).unlink()
+        except FileNotFoundError:
+            pass
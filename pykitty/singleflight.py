@@ -0,0 +1,58 @@
+import copy
+import threading
+from typing import Any, Callable, Dict, Hashable, TypeVar, Union
+
+T = TypeVar("T")
+
+
+class _Call:
+    def __init__(self) -> None:
+        self.done = threading.Event()
+        self.waiters = 0
+        self.result: Any = None
+        self.error: Union[BaseException, None] = None
+
+
+class SingleFlight:
+    """Coalesces concurrent calls with the same key into a single call.
+
+    The first caller of a key executes the function, callers arriving while it is
+    in flight wait for it and get a deep copy of its result (or its exception).
+    Nothing is cached once the call has finished.
+    """
+
+    def __init__(self) -> None:
+        self._lock = threading.Lock()
+        self._calls: Dict[Hashable, _Call] = {}
+
+    def do(self, key: Hashable, func: Callable[[], T]) -> T:
+        with self._lock:
+            call = self._calls.get(key)
+            if call is None:
+                call = self._calls[key] = _Call()
+                is_leader = True
+            else:
+                call.waiters += 1
+                is_leader = False
+
+        if not is_leader:
+            call.done.wait()
+            if call.error is not None:
+                raise call.error
+            return copy.deepcopy(call.result)
+
+        try:
+            result = func()
+        except BaseException as error:
+            call.error = error
+            raise
+        finally:
+            with self._lock:
+                del self._calls[key]
+                waiters = call.waiters
+            if waiters and call.error is None:
+                # the leader may mutate its result, so waiters copy from a snapshot
+                call.result = copy.deepcopy(result)
+            call.done.set()
+
+        return result
@@ -0,0 +1,219 @@
+import base64
+import gzip
+import io
+import json
+import os
+import threading
+import time
+from collections import defaultdict, deque
+from typing import Deque, Dict, List, Tuple, Union
+from urllib.parse import parse_qsl, urlencode, urlsplit
+
+import requests
+from requests.adapters import BaseAdapter, HTTPAdapter
+from urllib3.response import HTTPResponse
+
+# the content is stored decoded, so the original framing headers do not apply
+_DROPPED_HEADERS = {"content-encoding", "content-length", "transfer-encoding"}
+
+
+class TransportConfig:
+    """Configures how the client talks to Kittysplit.
+
+    Sessions configured with the same instance share one adapter and thus one
+    connection pool.
+
+    Args:
+        connect_timeout (float, optional): Seconds to wait for a connection. Defaults to 10.
+        read_timeout (float, optional): Seconds to wait for a response. Defaults to 30.
+        pool_connections (int, optional): The number of hosts connection pools are kept for. Defaults to 10.
+        pool_maxsize (int, optional): The maximum number of connections kept per host. Defaults to 10.
+        pool_block (bool, optional): Wait for a free connection instead of opening one beyond `pool_maxsize`. Defaults to False.
+        keep_alive (bool, optional): Reuse connections across requests. Defaults to True.
+        adapter (BaseAdapter, optional): A custom adapter to send the requests with, replaces the pool settings. Defaults to None.
+        base_url (str, optional): The Kittysplit url, e.g. "https://kittysplit.de/". Defaults to None, which uses `KittySplitAPI.base_url`.
+    """
+
+    def __init__(
+        self,
+        connect_timeout: float = 10.0,
+        read_timeout: float = 30.0,
+        pool_connections: int = 10,
+        pool_maxsize: int = 10,
+        pool_block: bool = False,
+        keep_alive: bool = True,
+        adapter: Union[BaseAdapter, None] = None,
+        base_url: Union[str, None] = None,
+    ) -> None:
+        self.connect_timeout = connect_timeout
+        self.read_timeout = read_timeout
+        self.pool_connections = pool_connections
+        self.pool_maxsize = pool_maxsize
+        self.pool_block = pool_block
+        self.keep_alive = keep_alive
+        self.adapter = adapter
+        if base_url is not None and not base_url.endswith("/"):
+            base_url += "/"
+        self.base_url = base_url
+        self._lock = threading.Lock()
+        self._default_adapter: Union[HTTPAdapter, None] = None
+
+    @property
+    def timeout(self) -> Tuple[float, float]:
+        return self.connect_timeout, self.read_timeout
+
+    def get_adapter(self) -> BaseAdapter:
+        if self.adapter is not None:
+            return self.adapter
+        with self._lock:
+            if self._default_adapter is None:
+                self._default_adapter = HTTPAdapter(
+                    pool_connections=self.pool_connections,
+                    pool_maxsize=self.pool_maxsize,
+                    pool_block=self.pool_block,
+                )
+            return self._default_adapter
+
+    def configure_session(self, session: requests.Session) -> requests.Session:
+        adapter = self.get_adapter()
+        session.mount("https://", adapter)
+        session.mount("http://", adapter)
+        if not self.keep_alive:
+            session.headers["Connection"] = "close"
+        return session
+
+
+def _body_text(body: Union[str, bytes, None]) -> str:
+    if body is None:
+        return ""
+    if isinstance(body, bytes):
+        return body.decode("utf-8", errors="replace")
+    return body
+
+
+def _request_key(method: str, url: str, body: str) -> Tuple[str, str, str]:
+    # match on path and query only so archives replay against any base url, and
+    # ignore the CSRF token, which differs between sessions
+    parts = urlsplit(url)
+    fields = [(k, v) for k, v in parse_qsl(body) if k != "_csrf_token"]
+    return method.upper(), parts.path + "?" + parts.query, urlencode(sorted(fields))
+
+
+def read_archive(archive_path: Union[str, os.PathLike]) -> List[dict]:
+    """Returns the records of an archive written by `RecordingAdapter`."""
+    with gzip.open(archive_path, "rt", encoding="utf-8") as archive:
+        return [json.loads(line) for line in archive if line.strip()]
+
+
+class RecordingAdapter(HTTPAdapter):
+    """Sends requests like `HTTPAdapter` and appends each exchange to an archive.
+
+    The archive is a gzipped file of JSON lines with the method, url and body of
+    the request, and the status, headers, content and latency of the response.
+    Each exchange is appended as a gzip member of its own, so the archive can be
+    read while recording. It can be replayed with `ReplayAdapter`.
+
+    Example:
+        transport = TransportConfig(adapter=RecordingAdapter("traffic.jsonl.gz"))
+        api = KittySplitAPI("<kitty_URL>", transport=transport)
+
+    Args:
+        archive_path (str): The archive to append to.
+        **kwargs: Passed to `HTTPAdapter`, e.g. `pool_maxsize`.
+    """
+
+    def __init__(self, archive_path: Union[str, os.PathLike], **kwargs) -> None:
+        super().__init__(**kwargs)
+        self.archive_path = archive_path
+        self._archive_lock = threading.Lock()
+
+    def send(self, request: requests.PreparedRequest, **kwargs) -> requests.Response:
+        start = time.perf_counter()
+        response = super().send(request, **kwargs)
+        content = response.content  # the latency includes reading the body
+        elapsed = time.perf_counter() - start
+
+        record = {
+            "method": request.method,
+            "url": request.url,
+            "body": _body_text(request.body),
+            "status": response.status_code,
+            "reason": response.reason,
+            "headers": [
+                (name, value)
+                for name, value in response.raw.headers.items()
+                if name.lower() not in _DROPPED_HEADERS
+            ],
+            "elapsed": round(elapsed, 6),
+        }
+        try:
+            record["text"] = content.decode("utf-8")
+        except UnicodeDecodeError:
+            record["base64"] = base64.b64encode(content).decode("ascii")
+        line = json.dumps(record, separators=(",", ":")) + "\n"
+
+        with self._archive_lock:
+            with gzip.open(self.archive_path, "at", encoding="utf-8") as archive:
+                archive.write(line)
+        return response
+
+
+class ReplayMissError(requests.ConnectionError):
+    """The archive has no response for a request."""
+
+
+class ReplayAdapter(HTTPAdapter):
+    """Answers requests from an archive written by `RecordingAdapter`.
+
+    Requests are matched by method, path, query and body, without the CSRF token.
+    Repeated requests get the recorded responses in order, the last one is
+    repeated once they are used up. Each response is delayed by its recorded
+    latency times `latency_scale`, outside of any lock, so concurrent requests
+    overlap like they would on the network.
+
+    Args:
+        archive_path (str): The archive to replay.
+        latency_scale (float, optional): Factor applied to the recorded latencies, 0 replays without delay. Defaults to 1.
+    """
+
+    def __init__(
+        self, archive_path: Union[str, os.PathLike], latency_scale: float = 1.0
+    ) -> None:
+        super().__init__()
+        self.latency_scale = latency_scale
+        self._records: Dict[Tuple[str, str, str], Deque[dict]] = defaultdict(deque)
+        self._lock = threading.Lock()
+        for record in read_archive(archive_path):
+            key = _request_key(record["method"], record["url"], record["body"])
+            self._records[key].append(record)
+
+    def __len__(self) -> int:
+        return sum(len(records) for records in self._records.values())
+
+    def send(self, request: requests.PreparedRequest, **kwargs) -> requests.Response:
+        key = _request_key(request.method, request.url, _body_text(request.body))
+        with self._lock:
+            records = self._records.get(key)
+            if not records:
+                raise ReplayMissError(
+                    f"No recorded response for {request.method} {request.url}",
+                    request=request,
+                )
+            record = records.popleft() if len(records) > 1 else records[0]
+
+        if self.latency_scale > 0:
+            time.sleep(record["elapsed"] * self.latency_scale)
+
+        if "base64" in record:
+            content = base64.b64decode(record["base64"])
+        else:
+            content = record["text"].encode("utf-8")
+        raw = HTTPResponse(
+            body=io.BytesIO(content),
+            headers=[tuple(header) for header in record["headers"]],
+            status=record["status"],
+            reason=record["reason"],
+            preload_content=False,
+            decode_content=False,
+        )
+        return self.build_response(request, raw)
@@ -0,0 +1,238 @@
+import logging
+import queue
+import shutil
+import threading
+import time
+from pathlib import Path
+from typing import Callable, Dict, List, Set, TextIO, Tuple, Union
+
+from pykitty.client import KittySplitAPI
+
+logger = logging.getLogger(__name__)
+
+
+class WatchStats:
+    def __init__(self) -> None:
+        self.started_at = time.monotonic()
+        self.rows_written = 0
+        self.rows_failed = 0
+        self.files_processed = 0
+        self.files_failed = 0
+
+    @property
+    def rows_per_second(self) -> float:
+        elapsed = time.monotonic() - self.started_at
+        return self.rows_written / elapsed if elapsed else 0.0
+
+    def __str__(self) -> str:
+        return (
+            f"{self.rows_written} expenses added ({self.rows_per_second:.2f}/s), "
+            f"{self.rows_failed} failed, {self.files_processed} files processed, "
+            f"{self.files_failed} files failed"
+        )
+
+
+class _FileJob:
+    def __init__(self, path: Path, number_of_rows: int) -> None:
+        self.path = path
+        self.remaining_rows = number_of_rows
+        self.failed_rows = 0
+
+
+class CSVWatcher:
+    """Adds the expenses of csv files dropped into a directory to a kitty.
+
+    The directory is polled for `*.csv` files, which are read once their size
+    stopped changing. Their rows are put on a bounded queue, from which a writer
+    thread adds them in batches with one warm client. When the queue is full,
+    scanning pauses until the writer caught up. Files are moved to `processed_dir`
+    once all their rows are added, or to `failed_dir` if a row failed. The other
+    rows of a failed file are added nevertheless, so dropping it into the
+    directory again adds them twice.
+
+    Args:
+        api (KittySplitAPI): The client of the kitty, with the user selected.
+        directory (Path): The directory to watch.
+        read_expenses (Callable[[TextIO], List[dict]]): Reads the expenses of a csv file, e.g. `cli.read_expenses`.
+        processed_dir (Path, optional): Defaults to `directory / "processed"`.
+        failed_dir (Path, optional): Defaults to `directory / "failed"`.
+        weight_mapping (Dict[str, float], optional): The weights of the expenses. Defaults to None.
+        poll_interval (float, optional): Seconds between two scans of the directory. Defaults to 2.
+        batch_size (int, optional): The maximum number of rows the writer takes off the queue at once. Defaults to 20.
+        queue_size (int, optional): The maximum number of rows waiting to be written. Defaults to 100.
+        timeout_between_requests (float, optional): Seconds to wait between two writes. Defaults to 0.5.
+    """
+
+    def __init__(
+        self,
+        api: KittySplitAPI,
+        directory: Path,
+        read_expenses: Callable[[TextIO], List[dict]],
+        processed_dir: Union[Path, None] = None,
+        failed_dir: Union[Path, None] = None,
+        weight_mapping: Union[Dict[str, float], None] = None,
+        poll_interval: float = 2.0,
+        batch_size: int = 20,
+        queue_size: int = 100,
+        timeout_between_requests: float = 0.5,
+    ) -> None:
+        self.api = api
+        self.directory = Path(directory)
+        self.read_expenses = read_expenses
+        self.processed_dir = Path(processed_dir or self.directory / "processed")
+        self.failed_dir = Path(failed_dir or self.directory / "failed")
+        self.weight_mapping = weight_mapping
+        self.poll_interval = poll_interval
+        self.batch_size = batch_size
+        self.timeout_between_requests = timeout_between_requests
+        self.stats = WatchStats()
+        self._queue: "queue.Queue[Tuple[_FileJob, dict]]" = queue.Queue(queue_size)
+        self._sizes: Dict[Path, int] = {}  # size of files at the last scan
+        self._queued: Dict[Path, _FileJob] = {}
+        self._unmovable: Set[Path] = set()  # read files that could not be moved
+        self._stopped = threading.Event()
+        self._writer: Union[threading.Thread, None] = None
+
+    def start(self) -> None:
+        self.processed_dir.mkdir(parents=True, exist_ok=True)
+        self.failed_dir.mkdir(parents=True, exist_ok=True)
+        self._writer = threading.Thread(target=self._write_loop, daemon=True)
+        self._writer.start()
+
+    def run(
+        self,
+        report: Union[Callable[[WatchStats], None], None] = None,
+        report_interval: float = 60.0,
+    ) -> None:
+        """Scans the directory until `stop` is called, then waits for the queued rows.
+
+        Args:
+            report (Callable[[WatchStats], None], optional): Called with the stats every `report_interval` seconds and at the end. Defaults to None.
+            report_interval (float, optional): Defaults to 60.
+        """
+        self.start()
+        reported_at = time.monotonic()
+        try:
+            while not self._stopped.is_set():
+                self.scan()
+                self._stopped.wait(self.poll_interval)
+                if report and time.monotonic() - reported_at >= report_interval:
+                    report(self.stats)
+                    reported_at = time.monotonic()
+        finally:
+            self.stop()
+            self.join()
+            if report:
+                report(self.stats)
+
+    def stop(self) -> None:
+        self._stopped.set()
+
+    def join(self) -> None:
+        self._queue.join()
+        self._writer = None
+
+    def scan(self) -> None:
+        for path in sorted(self.directory.glob("*.csv")):
+            if (
+                path in self._queued
+                or path in self._unmovable
+                or self._stopped.is_set()
+            ):
+                continue
+
+            # only read files that are not being written anymore
+            try:
+                size = path.stat().st_size
+            except FileNotFoundError:  # moved by the writer meanwhile
+                continue
+            if self._sizes.get(path) != size:
+                self._sizes[path] = size
+                continue
+            del self._sizes[path]
+
+            try:
+                with open(path, newline="") as csv_file:
+                    expenses = self.read_expenses(csv_file)
+            except Exception:
+                # e.g. a short row or NUL bytes, the watcher has to keep running
+                logger.exception("Could not read %s", path)
+                self._move(path, self.failed_dir)
+                self.stats.files_failed += 1
+                continue
+
+            job = _FileJob(path, len(expenses))
+            if not expenses:
+                self._finish(job)
+                continue
+            self._queued[path] = job
+            for expense in expenses:
+                self._put((job, expense))
+
+    def _put(self, item: Tuple[_FileJob, dict]) -> None:
+        # blocks while the queue is full, this is the backpressure on scanning
+        while True:
+            try:
+                self._queue.put(item, timeout=self.poll_interval)
+                return
+            except queue.Full:
+                if self._writer is None or not self._writer.is_alive():
+                    raise RuntimeError("The writer is not running") from None
+
+    def _write_loop(self) -> None:
+        while True:
+            batch = [self._queue.get()]
+            while len(batch) < self.batch_size:
+                try:
+                    batch.append(self._queue.get_nowait())
+                except queue.Empty:
+                    break
+
+            for job, expense in batch:
+                try:
+                    self._write(job, expense)
+                finally:
+                    self._queue.task_done()
+                time.sleep(self.timeout_between_requests)
+            logger.debug("%s", self.stats)
+
+    def _write(self, job: _FileJob, expense: dict) -> None:
+        try:
+            self.api.add_expense(
+                amount=expense["amount"],
+                description=expense["description"],
+                entry_date=expense["entry_date"],
+                weight_mapping=self.weight_mapping,
+            )
+            self.stats.rows_written += 1
+        except Exception:
+            # e.g. a weight mapping without a user, the writer has to keep running
+            logger.exception("Could not add %s of %s", expense, job.path)
+            self.stats.rows_failed += 1
+            job.failed_rows += 1
+        finally:
+            job.remaining_rows -= 1
+
+        if job.remaining_rows == 0:
+            self._finish(job)
+
+    def _finish(self, job: _FileJob) -> None:
+        if job.failed_rows:
+            self._move(job.path, self.failed_dir)
+            self.stats.files_failed += 1
+        else:
+            self._move(job.path, self.processed_dir)
+            self.stats.files_processed += 1
+        self._queued.pop(job.path, None)
+
+    def _move(self, path: Path, target_dir: Path) -> None:
+        target = target_dir / path.name
+        if target.exists():
+            # keep earlier files of the same name
+            target = target_dir / f"{path.stem}-{int(time.time())}{path.suffix}"
+        try:
+            shutil.move(str(path), str(target))
+        except OSError:
+            # leave it in place, reading it again would add its rows twice
+            logger.exception("Could not move %s to %s", path, target_dir)
+            self._unmovable.add(path)
@@ -1,9 +1,13 @@
+import threading
+import time
 import unittest
+from pathlib import Path
 from unittest.mock import MagicMock, patch
 
 import requests
 
 from pykitty.client import KittySplitAPI
+from pykitty.profiling import PhaseProfiler
 
 
 class TestKittySplitAPI(unittest.TestCase):
@@ -42,5 +46,190 @@ class TestKittySplitAPI(unittest.TestCase):
         users = api.get_users()
         self.assertEqual(users, expected_users)
         mock_get.assert_called_with(
-            "GET", api.base_url + api.kitty_id + "/entries/", data=None
+            "GET",
+            api.base_url + api.kitty_id + "/entries/",
+            data=None,
+            timeout=(10.0, 30.0),
         )
+
+    @patch.object(requests.Session, "request")
+    def test_profiles_user_discovery(self, mock_request):
+        mock_request.return_value = MagicMock(text="")
+        profiler = PhaseProfiler()
+        profiler.start()
+        with profiler.phase("user discovery"):
+            KittySplitAPI(self.kitty_url, profiler=profiler)
+        profiler.stop()
+
+        self.assertIn(("user discovery", "request"), profiler.totals)
+
+    @patch("pykitty.client.get_csrf_token")
+    @patch.object(requests.Session, "request")
+    def test_tracks_viewing_party(self, mock_request, mock_get_csrf_token):
+        # the entries page lists the expenses paid by the viewing party as yours
+        entries_html = (
+            Path(__file__).parent / "fixtures" / "entries_de.html"
+        ).read_text()
+        mock_request.return_value = MagicMock(
+            text=entries_html.replace(
+                "<html>",
+                """<html>
+                    <form class="set-viewing-party">
+                        <input name="viewing_party_id" value="1">
+                        <button>Test User</button>
+                    </form>
+                    <form class="set-viewing-party">
+                        <input name="viewing_party_id" value="2">
+                        <button>test-user2</button>
+                    </form>
+                """,
+            )
+        )
+        mock_get_csrf_token.return_value = "token123"
+        api = KittySplitAPI(self.kitty_url)
+        self.assertIsNone(api.server_viewing_party_id)
+
+        api.select_user("Test User")
+        self.assertEqual(api.server_viewing_party_id, "1")
+        self.assertEqual(mock_request.call_count, 2)
+
+        # the server already views as the party
+        api.select_user("Test User")
+        api.get_expenses()
+        self.assertEqual(mock_request.call_count, 3)
+
+        api.select_user("test-user2")
+        self.assertEqual(api.server_viewing_party_id, "2")
+        self.assertEqual(mock_request.call_count, 4)
+
+        # the page was rendered for Test User, switch back and fetch again
+        api.get_expenses()
+        self.assertEqual(mock_request.call_count, 7)
+        self.assertEqual(
+            mock_request.call_args_list[5].kwargs["data"],
+            {"viewing_party_id": "2", "_csrf_token": "token123"},
+        )
+        self.assertEqual(api.server_viewing_party_id, "2")
+
+    @patch.object(requests.Session, "request")
+    def test_get_expenses_result(self, mock_request):
+        entries_html = (
+            Path(__file__).parent / "fixtures" / "entries_de.html"
+        ).read_text()
+        # the second entry can not be parsed
+        mock_request.return_value = MagicMock(
+            text=entries_html.replace("0,85</span> für", "0,85</span> an")
+        )
+        with patch.object(KittySplitAPI, "get_users") as mock_get_users:
+            mock_get_users.return_value = {"Test User": "1"}
+            api = KittySplitAPI(self.kitty_url)
+        api.selected_viewing_party_id = api.server_viewing_party_id = "1"
+
+        with self.assertLogs("pykitty.kitty_parser", "WARNING"):
+            result = api.get_expenses_result()
+        self.assertEqual(result.parsed_count, 1)
+        self.assertEqual(result.skipped_count, 1)
+        self.assertEqual(result.skipped[0].position, 1)
+        self.assertEqual(
+            result.entries[0]["url"],
+            "https://kittysplit.de/test_kitty/ADLKFJLAKD/entries/8233980/edit",
+        )
+        with self.assertLogs("pykitty.kitty_parser", "WARNING"):
+            self.assertEqual(api.get_expenses(), result.entries)
+
+    @patch("pykitty.client.get_csrf_token")
+    @patch.object(requests.Session, "request")
+    def test_as_user(self, mock_request, mock_get_csrf_token):
+        mock_request.return_value = MagicMock(text="")
+        mock_get_csrf_token.return_value = "token123"
+        with patch.object(KittySplitAPI, "get_users") as mock_get_users:
+            mock_get_users.return_value = {"test-user1": "1", "test-user2": "2"}
+            api = KittySplitAPI(self.kitty_url)
+
+        with api.as_user("test-user1") as user1_api:
+            self.assertEqual(user1_api.selected_viewing_party_id, "1")
+            with self.assertRaises(ValueError):
+                user1_api.select_user("test-user2")
+        with api.as_user("test-user2") as user2_api:
+            self.assertEqual(user2_api.selected_viewing_party_id, "2")
+        with api.as_user("test-user1") as user1_api_again:
+            self.assertIs(user1_api_again, user1_api)
+
+        self.assertIsNot(user1_api.session, user2_api.session)
+        self.assertIsNot(user1_api.session, api.session)
+        self.assertIsNone(api.selected_viewing_party_id)
+        self.assertEqual(mock_request.call_count, 2)
+
+
+class TestKittySplitAPICoalescing(unittest.TestCase):
+    def setUp(self):
+        entries_html = (
+            Path(__file__).parent / "fixtures" / "entries_de.html"
+        ).read_text()
+        self.page = entries_html.replace(
+            "<html>",
+            """<html>
+                <form class="set-viewing-party">
+                    <input name="viewing_party_id" value="1">
+                    <button>Test User</button>
+                </form>
+            """,
+        )
+        with patch.object(KittySplitAPI, "get_users") as mock_get_users:
+            mock_get_users.return_value = {"Test User": "1"}
+            self.api = KittySplitAPI("https://kittysplit.de/test_kitty/ADLKFJLAKD/")
+        self.api.selected_viewing_party_id = "1"
+        self.api.server_viewing_party_id = "1"
+
+        self.in_flight = threading.Semaphore(0)
+        self.release = threading.Event()
+        patcher = patch.object(requests.Session, "request", side_effect=self.request)
+        self.mock_request = patcher.start()
+        self.addCleanup(patcher.stop)
+
+    def request(self, method, url, **kwargs):
+        if url.endswith("/entries/"):
+            self.in_flight.release()
+            self.release.wait(5)
+        return MagicMock(text=self.page)
+
+    def entries_requests(self):
+        return [
+            call
+            for call in self.mock_request.call_args_list
+            if call.args[1].endswith("/entries/")
+        ]
+
+    def run_in_thread(self, func, results):
+        thread = threading.Thread(target=lambda: results.append(func()))
+        thread.start()
+        return thread
+
+    def test_coalesces_identical_reads(self):
+        results = []
+        threads = [self.run_in_thread(self.api.get_expenses, results) for _ in range(3)]
+        self.assertTrue(self.in_flight.acquire(timeout=5))
+        time.sleep(0.1)  # let the other callers join the flight
+        self.release.set()
+        for thread in threads:
+            thread.join()
+
+        self.assertEqual(len(self.entries_requests()), 1)
+        self.assertEqual([len(result) for result in results], [2, 2, 2])
+
+    def test_does_not_coalesce_different_endpoints_of_a_path(self):
+        # get_users and get_expenses both read /entries/
+        expenses, users = [], []
+        threads = [self.run_in_thread(self.api.get_expenses, expenses)]
+        self.assertTrue(self.in_flight.acquire(timeout=5))
+        with self.api.as_user("Test User") as user_api:
+            # lanes share the flights of their root client
+            threads.append(self.run_in_thread(user_api.get_users, users))
+            self.in_flight.acquire(timeout=1)
+        self.release.set()
+        for thread in threads:
+            thread.join()
+
+        self.assertEqual(users, [{"Test User": "1"}])
+        self.assertIsInstance(expenses[0], list)
+        self.assertEqual(expenses[0][0]["buyer"], "Test User")
@@ -0,0 +1,83 @@
+import unittest
+from datetime import date, datetime
+
+from pykitty.expense_index import ExpenseIndex, split_participants
+
+
+def expense(id, buyer, amount, description, day, participants="all"):
+    return {
+        "url": f"https://kittysplit.de/test_kitty/ADLKFJLAKD/entries/{id}/edit",
+        "id": id,
+        "buyer": buyer,
+        "price": {"currency": "€", "amount": amount},
+        "description": description,
+        "date": datetime(2023, 3, day) if day else datetime(2023, 4, 1),
+        "participants": participants,
+    }
+
+
+class TestExpenseIndex(unittest.TestCase):
+    def setUp(self):
+        self.expenses = [
+            expense("1", "user1", "60.00", "Aral Station Muenchen", 6),
+            expense("2", "user1", "23.57", "EDEKA Muenchen DE", 27),
+            expense("3", "user2", "80.00", "Aral Station Berlin", 15),
+            expense("4", "user1", "75.00", "ARAL Tankstelle", None),
+            expense("5", "user1", "90.00", "Shell", 20, participants="user1, user2"),
+        ]
+        self.index = ExpenseIndex(self.expenses)
+
+    def ids(self, expenses):
+        return [expense["id"] for expense in expenses]
+
+    def test_query(self):
+        result = self.index.query(
+            buyer="user1",
+            date_from=date(2023, 3, 1),
+            date_to=date(2023, 3, 31),
+            min_amount=50,
+            text="aral",
+        )
+        self.assertEqual(self.ids(result), ["1"])
+
+    def test_query_ranges(self):
+        self.assertEqual(
+            self.ids(self.index.query(date_from=date(2023, 3, 15))),
+            ["3", "5", "2", "4"],
+        )
+        self.assertEqual(
+            self.ids(self.index.query(min_amount="60", max_amount=80)), ["1", "3", "4"]
+        )
+
+    def test_query_participant(self):
+        self.assertEqual(
+            self.ids(self.index.query(participant="user2")), ["1", "3", "5", "2", "4"]
+        )
+        self.assertEqual(
+            self.ids(self.index.query(participant="user3")), ["1", "3", "2", "4"]
+        )
+
+    def test_query_without_filters(self):
+        self.assertEqual(len(self.index.query()), 5)
+
+    def test_query_text_without_words(self):
+        self.assertEqual(self.index.query(text="!!!"), [])
+
+    def test_add_and_remove(self):
+        self.index.remove("1")
+        self.assertNotIn("1", self.index)
+        self.assertEqual(self.ids(self.index.query(text="Aral Station")), ["3"])
+
+        self.index.add(expense("6", "user2", "55.00", "Aral Station Hamburg", 2))
+        self.assertEqual(self.ids(self.index.query(text="aral station")), ["6", "3"])
+        self.assertEqual(self.ids(self.index.query(max_amount=55)), ["6", "2"])
+
+        # adding an existing id replaces the expense
+        self.index.add(expense("6", "user2", "10.00", "Bakery", 2))
+        self.assertEqual(self.ids(self.index.query(text="aral station")), ["3"])
+        self.assertEqual(len(self.index), 5)
+
+    def test_split_participants(self):
+        self.assertEqual(
+            split_participants("user1, user2 and user3"), ["user1", "user2", "user3"]
+        )
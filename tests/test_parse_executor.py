@@ -0,0 +1,93 @@
+import unittest
+
+from pykitty.kitty_parser import ExpenseParseError, ExpenseType, parse_expenses_result
+from pykitty.parse_executor import (
+    ParsingExecutor,
+    parse_expense_detail,
+    split_entries_page,
+)
+
+ENTRY_HTML = """
+    <li class="py-1 entry-list-item entry-all entry-yours">
+        <a class="entry-link" href="/test_kitty/ADLKFJLAKD/entries/{id}/edit">
+            <div class="col-xs-11">Test User {verb} €{id},00 für Entry {id} bezahlt.</div>
+            <span class="entry-label entry-label-parties">Teilnehmer: Alle.</span>
+            <span class="entry-label entry-label-date">27.03.2023</span>
+        </a>
+    </li>
+"""
+
+DETAIL_HTML = """
+    <form class="edit-entry-form">
+        <input type="hidden" name="entry[entry_type]" value="expense">
+        <input type="text" name="entry[amount]" value="{id}.00">
+        <input type="hidden" name="entry[entry_shares][0][party_id]" value="1">
+    </form>
+"""
+
+
+def entries_page(number_of_entries, unparsable_ids=()):
+    entries = "".join(
+        ENTRY_HTML.format(id=id, verb="zahlt" if id in unparsable_ids else "hat")
+        for id in range(1, number_of_entries + 1)
+    )
+    return f'<html><ul class="entries">{entries}</ul></html>'
+
+
+class TestSplitEntriesPage(unittest.TestCase):
+    def test_split(self):
+        chunks = split_entries_page(entries_page(10), number_of_chunks=3)
+        self.assertEqual(len(chunks), 3)
+        self.assertEqual(
+            [chunk.count("entry-list-item") for chunk in chunks], [4, 4, 2]
+        )
+
+    def test_split_single_entry(self):
+        html = entries_page(1)
+        self.assertEqual(split_entries_page(html, number_of_chunks=3), [html])
+
+
+class TestParsingExecutor(unittest.TestCase):
+    def setUp(self):
+        self.executor = ParsingExecutor(
+            max_workers=2, min_parallel_bytes=0, chunks_per_worker=2
+        )
+
+    def tearDown(self):
+        self.executor.shutdown()
+
+    def test_parse_expenses(self):
+        html = entries_page(20, unparsable_ids=(7,))
+        result = self.executor.parse_expenses(html.encode(), ExpenseType.ALL)
+        expected = parse_expenses_result(html, ExpenseType.ALL)
+
+        self.assertEqual(result.entries, expected.entries)
+        self.assertEqual(result.skipped, expected.skipped)
+        self.assertEqual(result.skipped[0].position, 6)
+        self.assertEqual(result.locale, "de")
+
+    def test_parse_expenses_logs_page_once(self):
+        html = entries_page(20, unparsable_ids=(3, 17))
+        with self.assertLogs("pykitty.kitty_parser", "WARNING") as logs:
+            self.executor.parse_expenses(html, ExpenseType.ALL)
+        self.assertEqual(
+            logs.output, ["WARNING:pykitty.kitty_parser:Skipped 2 of 20 entries"]
+        )
+
+    def test_parse_expenses_strict(self):
+        html = entries_page(20, unparsable_ids=(17,))
+        with self.assertRaises(ExpenseParseError) as context:
+            self.executor.parse_expenses(html, ExpenseType.ALL, strict=True)
+        self.assertEqual(context.exception.skipped_entry.position, 16)
+
+    def test_parse_expense_details(self):
+        pages = [DETAIL_HTML.format(id=id).encode() for id in range(1, 6)]
+        details = self.executor.parse_expense_details(pages)
+        self.assertEqual(details, [parse_expense_detail(page) for page in pages])
+        self.assertEqual(details[2]["amount"], "3.00")
+        self.assertEqual(details[2]["entry_shares"], [{"party_id": "1"}])
+
+    def test_stays_in_process_below_threshold(self):
+        executor = ParsingExecutor(max_workers=2)
+        executor.parse_expenses(entries_page(2), ExpenseType.ALL)
+        self.assertIsNone(executor._pool)
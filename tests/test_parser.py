@@ -1,13 +1,22 @@
 import unittest
 from datetime import datetime
+from pathlib import Path
 
 from pykitty.kitty_parser import (
+    LOCALES,
     CSRFHTMLParser,
+    ExpenseParseError,
     ExpenseType,
     KittySplitUserParser,
+    detect_locale,
+    detect_page_format,
     parse_expenses,
+    parse_expenses_result,
+    parse_viewing_party_name,
 )
 
+FIXTURES_DIR = Path(__file__).parent / "fixtures"
+
 
 class TestCSRFHTMLParser(unittest.TestCase):
     def setUp(self):
@@ -82,6 +91,25 @@ class TestKittySplitUserParser(unittest.TestCase):
         self.assertEqual(parser.usernames, [("1234", "Party 1"), ("5678", "Party 2")])
 
 
+class TestParseViewingPartyName(unittest.TestCase):
+    def setUp(self):
+        self.html = (FIXTURES_DIR / "entries_de.html").read_text()
+
+    def test_parse_viewing_party_name(self):
+        self.assertEqual(parse_viewing_party_name(self.html), "Test User")
+
+    def test_parse_viewing_party_name_without_own_entries(self):
+        html = self.html.replace("entry-yours", "entry-others")
+        self.assertIsNone(parse_viewing_party_name(html))
+
+
+class TestDetectPageFormat(unittest.TestCase):
+    def test_detect_page_format(self):
+        html = (FIXTURES_DIR / "entries_de.html").read_text()
+        self.assertEqual(detect_page_format(html), ("de", "%d.%m.%Y"))
+        self.assertEqual(detect_page_format("<html></html>"), (None, None))
+
+
 class TestParseExpenses(unittest.TestCase):
     def test_parse_expenses(self):
         german_html = """
@@ -254,3 +282,61 @@ class TestParseExpenses(unittest.TestCase):
             parse_expenses(english_html, expense_type=ExpenseType.ALL),
             expected_output_english,
         )
+
+
+class TestKittyLocale(unittest.TestCase):
+    def test_detect_locale(self):
+        self.assertIs(
+            detect_locale("Test User hat €23,57 für EDEKA bezahlt."), LOCALES["de"]
+        )
+        self.assertIs(detect_locale("Test User paid €23.57 for EDEKA"), LOCALES["en"])
+        self.assertIsNone(detect_locale("Test User a payé 23,57 € pour EDEKA"))
+
+    def test_parse_number(self):
+        self.assertEqual(LOCALES["de"].parse_number("1.234,56"), "1234.56")
+        self.assertEqual(LOCALES["en"].parse_number("1,234.56"), "1234.56")
+
+    def test_detect_date_format(self):
+        self.assertEqual(LOCALES["de"].detect_date_format("27.03.2023"), "%d.%m.%Y")
+        self.assertEqual(LOCALES["en"].detect_date_format("2023-03-27"), "%Y-%m-%d")
+        self.assertIsNone(LOCALES["en"].detect_date_format("27.03.2023"))
+
+
+class TestParseExpensesResult(unittest.TestCase):
+    html = """
+        <ul class="entries list-unstyled">
+            <li class="py-1 entry-list-item entry-all entry-yours">
+                <a class="entry-link" href="/test_kitty/ADLKFJLAKD/entries/8233980/edit">
+                    <div class="col-xs-11">Test User paid €23.57 for EDEKA</div>
+                    <span class="entry-label entry-label-parties">People involved: everyone.</span>
+                    <span class="entry-label entry-label-date">03/06/2023</span>
+                </a>
+            </li>
+            <li class="py-1 entry-list-item entry-all entry-others">
+                <a class="entry-link" href="/test_kitty/ADLKFJLAKD/entries/8233979/edit">
+                    <div class="col-xs-11">Test User transferred €5.00 to Other User</div>
+                    <span class="entry-label entry-label-parties">People involved: everyone.</span>
+                    <span class="entry-label entry-label-date">03/06/2023</span>
+                </a>
+            </li>
+        </ul>
+    """
+
+    def test_skipped_entries(self):
+        with self.assertLogs("pykitty.kitty_parser", level="WARNING") as logs:
+            result = parse_expenses_result(self.html, expense_type=ExpenseType.ALL)
+
+        self.assertEqual(result.locale, "en")
+        self.assertEqual(result.parsed_count, 1)
+        self.assertEqual(result.entries[0]["id"], "8233980")
+        self.assertEqual(result.skipped_count, 1)
+        self.assertEqual(result.skipped[0].position, 1)
+        self.assertEqual(
+            result.skipped[0].raw_text, "Test User transferred €5.00 to Other User"
+        )
+        self.assertIn("Skipped 1 of 2 entries", logs.output[0])
+
+    def test_strict(self):
+        with self.assertRaises(ExpenseParseError) as context:
+            parse_expenses_result(self.html, expense_type=ExpenseType.ALL, strict=True)
+        self.assertEqual(context.exception.skipped_entry.position, 1)
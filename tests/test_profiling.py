@@ -0,0 +1,49 @@
+import os
+import pstats
+import tempfile
+import time
+import unittest
+
+from pykitty.profiling import UNATTRIBUTED_PHASE, PhaseProfiler
+
+
+class TestPhaseProfiler(unittest.TestCase):
+    def setUp(self):
+        self.tmp_dir = tempfile.TemporaryDirectory()
+
+    def tearDown(self):
+        self.tmp_dir.cleanup()
+
+    def test_phases(self):
+        profiler = PhaseProfiler()
+        profiler.start()
+        for _ in range(2):
+            with profiler.phase("write"):
+                with profiler.phase("csrf fetch"):
+                    time.sleep(0.01)
+        time.sleep(0.01)
+        profiler.stop()
+
+        rows = {name: (count, total) for name, count, total, _ in profiler.rows()}
+        self.assertEqual(list(rows), ["write", "  csrf fetch", UNATTRIBUTED_PHASE])
+        self.assertEqual(rows["write"][0], 2)
+        self.assertGreaterEqual(rows["write"][1], rows["  csrf fetch"][1])
+        self.assertGreaterEqual(rows[UNATTRIBUTED_PHASE][1], 0.01)
+
+    def test_outputs(self):
+        stats_path = os.path.join(self.tmp_dir.name, "run.pstats")
+        collapsed_path = os.path.join(self.tmp_dir.name, "run.folded")
+        profiler = PhaseProfiler(
+            stats_path=stats_path, collapsed_path=collapsed_path, sample_interval=0.001
+        )
+        profiler.start()
+        with profiler.phase("sleep"):
+            time.sleep(0.05)
+        profiler.stop()
+
+        self.assertGreater(pstats.Stats(stats_path).total_calls, 0)
+        with open(collapsed_path) as collapsed_file:
+            lines = collapsed_file.read().splitlines()
+        self.assertTrue(lines)
+        self.assertTrue(any(line.startswith("[sleep];") for line in lines))
+        self.assertTrue(all(line.rsplit(" ", 1)[1].isdigit() for line in lines))
@@ -0,0 +1,155 @@
+import json
+import threading
+import time
+import unittest
+from contextlib import contextmanager
+from datetime import datetime
+from unittest.mock import MagicMock
+from urllib.error import HTTPError
+from urllib.request import Request, urlopen
+
+from pykitty.server import KittyCache, KittyServer
+
+
+def expense(id, buyer, amount, description):
+    return {
+        "url": f"https://kittysplit.de/test_kitty/ADLKFJLAKD/entries/{id}/edit",
+        "id": id,
+        "buyer": buyer,
+        "price": {"currency": "€", "amount": amount},
+        "description": description,
+        "date": datetime(2023, 3, 6),
+        "participants": "all",
+    }
+
+
+class TestKittyServer(unittest.TestCase):
+    def setUp(self):
+        self.user_api = MagicMock()
+        self.user_api.get_users.return_value = {"test-user1": "1", "test-user2": "2"}
+        self.user_api.get_expenses.return_value = [
+            expense("1", "test-user1", "60.00", "Aral Station"),
+            expense("2", "test-user2", "23.57", "EDEKA"),
+        ]
+        self.user_api.get_expense.return_value = {"id": "1", "amount": "60.00"}
+
+        api = MagicMock(kitty_id="test_kitty/ADLKFJLAKD")
+
+        @contextmanager
+        def as_user(username):
+            yield self.user_api
+
+        api.as_user.side_effect = as_user
+        self.cache = KittyCache(api, "test-user1", write_interval=0)
+        self.server = KittyServer(("127.0.0.1", 0), {"flat": self.cache})
+        self.server.start_caches()
+        threading.Thread(target=self.server.serve_forever, daemon=True).start()
+        self.base_url = f"http://127.0.0.1:{self.server.server_port}"
+
+    def tearDown(self):
+        self.server.shutdown()
+        self.server.server_close()
+
+    def request(self, path, method="GET", body=None):
+        data = json.dumps(body).encode() if body is not None else None
+        with urlopen(Request(self.base_url + path, data=data, method=method)) as r:
+            return r.status, json.loads(r.read())
+
+    def test_reads_are_served_from_cache(self):
+        self.assertEqual(
+            self.request("/kitties/flat/users")[1],
+            {"test-user1": "1", "test-user2": "2"},
+        )
+        _, expenses = self.request("/kitties/flat/expenses")
+        self.assertEqual([e["id"] for e in expenses], ["1", "2"])
+        self.assertEqual(expenses[0]["date"], "2023-03-06T00:00:00")
+        _, expenses = self.request("/kitties/flat/expenses?type=others")
+        self.assertEqual([e["id"] for e in expenses], ["2"])
+        _, expenses = self.request("/kitties/flat/expenses?text=aral&min_amount=50")
+        self.assertEqual([e["id"] for e in expenses], ["1"])
+
+        for _ in range(2):
+            self.assertEqual(
+                self.request("/kitties/flat/expenses/1")[1]["amount"], "60.00"
+            )
+
+        self.assertEqual(self.user_api.get_users.call_count, 1)
+        self.assertEqual(self.user_api.get_expenses.call_count, 1)
+        self.assertEqual(self.user_api.get_expense.call_count, 1)
+
+    def test_writes_are_forwarded(self):
+        status, _ = self.request(
+            "/kitties/flat/expenses",
+            method="POST",
+            body={"username": "test-user2", "amount": 10, "description": "Lunch"},
+        )
+        self.assertEqual(status, 201)
+        self.user_api.add_expense.assert_called_once_with(
+            amount="10", description="Lunch", entry_date=None, weight_mapping=None
+        )
+
+        # the write triggers a refresh, which sees the expense deleted upstream
+        self.user_api.get_expenses.return_value = [
+            expense("2", "test-user2", "23.57", "EDEKA")
+        ]
+        status, _ = self.request(
+            "/kitties/flat/expenses/1?username=test-user1", method="DELETE"
+        )
+        self.assertEqual(status, 200)
+        self.user_api.delete_expense.assert_called_once_with("1")
+        _, expenses = self.request("/kitties/flat/expenses")
+        self.assertEqual([e["id"] for e in expenses], ["2"])
+
+    def test_errors(self):
+        with self.assertRaises(HTTPError) as context:
+            self.request("/kitties/unknown/users")
+        self.assertEqual(context.exception.code, 404)
+
+        with self.assertRaises(HTTPError) as context:
+            self.request("/kitties/flat/expenses", method="POST", body={"amount": 1})
+        self.assertEqual(context.exception.code, 400)
+        self.assertEqual(
+            json.loads(context.exception.read()), {"error": "Missing field 'username'"}
+        )
+
+        for amount in ("abc", "nan"):
+            with self.assertRaises(HTTPError) as context:
+                self.request(f"/kitties/flat/expenses?min_amount={amount}")
+            self.assertEqual(context.exception.code, 400)
+
+        # errors of the client are no missing fields of the request
+        self.user_api.add_expense.side_effect = KeyError("test-user3")
+        with self.assertRaises(HTTPError) as context:
+            self.request(
+                "/kitties/flat/expenses",
+                method="POST",
+                body={"username": "test-user1", "amount": 1, "description": "Lunch"},
+            )
+        self.assertEqual(context.exception.code, 500)
+        self.assertEqual(
+            json.loads(context.exception.read()), {"error": "KeyError: 'test-user3'"}
+        )
+
+    def wait_for(self, condition):
+        deadline = time.monotonic() + 5
+        while not condition() and time.monotonic() < deadline:
+            time.sleep(0.01)
+        self.assertTrue(condition())
+
+    def test_failed_refreshes_are_reported(self):
+        self.user_api.get_expenses.side_effect = ValueError("test-user1 not available!")
+        with self.assertLogs("pykitty.server", "ERROR"):
+            self.cache._refresh_requested.set()
+            self.wait_for(lambda: self.cache.refresh_error is not None)
+
+        _, kitties = self.request("/kitties")
+        self.assertEqual(
+            kitties["flat"]["refresh_error"], "ValueError: test-user1 not available!"
+        )
+        # the stale expenses are still served
+        self.assertEqual(len(self.request("/kitties/flat/expenses")[1]), 2)
+
+        # the refresh loop keeps running
+        self.user_api.get_expenses.side_effect = None
+        self.cache._refresh_requested.set()
+        self.wait_for(lambda: self.cache.refresh_error is None)
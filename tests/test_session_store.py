@@ -0,0 +1,164 @@
+import tempfile
+import time
+import unittest
+from unittest.mock import MagicMock, patch
+
+import requests
+
+from pykitty.client import KittySplitAPI
+from pykitty.session_store import SessionStore
+
+
+class TestSessionStore(unittest.TestCase):
+    def setUp(self):
+        self.tmp_dir = tempfile.TemporaryDirectory()
+        self.store = SessionStore(self.tmp_dir.name)
+        self.kitty_id = "test_kitty/ADLKFJLAKD"
+        self.state = {
+            "cookies": [],
+            "available_users": {"test-user1": "1", "test-user2": "2"},
+            "selected_viewing_party_id": "1",
+            "csrf_token": "token123",
+        }
+
+    def tearDown(self):
+        self.tmp_dir.cleanup()
+
+    def test_save_and_load(self):
+        self.store.save(self.kitty_id, self.state)
+        state = self.store.load(self.kitty_id)
+        self.assertEqual(state["available_users"], self.state["available_users"])
+        self.assertEqual(state["csrf_token"], "token123")
+
+    def test_load_missing(self):
+        self.assertIsNone(self.store.load(self.kitty_id))
+
+    def test_load_stale(self):
+        self.store.save(self.kitty_id, self.state)
+        self.store.max_age = 60
+        with patch.object(time, "time", return_value=time.time() + 120):
+            self.assertIsNone(self.store.load(self.kitty_id))
+
+    def test_clear(self):
+        self.store.save(self.kitty_id, self.state)
+        self.store.clear(self.kitty_id)
+        self.assertIsNone(self.store.load(self.kitty_id))
+
+
+class TestKittySplitAPISessionStore(unittest.TestCase):
+    def setUp(self):
+        self.tmp_dir = tempfile.TemporaryDirectory()
+        self.store = SessionStore(self.tmp_dir.name)
+        self.kitty_url = "https://kittysplit.de/test_kitty/ADLKFJLAKD/"
+
+    def tearDown(self):
+        self.tmp_dir.cleanup()
+
+    @patch.object(KittySplitAPI, "get_users")
+    def test_restores_state_without_requests(self, mock_get_users):
+        mock_get_users.return_value = {"test-user1": "1", "test-user2": "2"}
+        api = KittySplitAPI(self.kitty_url, session_store=self.store)
+        api.session.cookies.set("_kittysplit_key", "abc", domain="kittysplit.de")
+        api.csrf_token = "token123"
+        api._save_session_state()
+
+        restored_api = KittySplitAPI(self.kitty_url, session_store=self.store)
+        self.assertEqual(mock_get_users.call_count, 1)
+        self.assertEqual(restored_api.available_users, api.available_users)
+        self.assertEqual(restored_api.csrf_token, "token123")
+        self.assertEqual(restored_api.session.cookies.get("_kittysplit_key"), "abc")
+
+    @patch("pykitty.client.get_csrf_token")
+    @patch.object(KittySplitAPI, "get_users")
+    def test_refreshes_rejected_csrf_token(self, mock_get_users, mock_get_csrf_token):
+        mock_get_users.return_value = {"test-user1": "1"}
+        mock_get_csrf_token.return_value = "fresh-token"
+        api = KittySplitAPI(self.kitty_url, session_store=self.store)
+        api.csrf_token = "expired-token"
+
+        rejected_response = MagicMock(status_code=403)
+        with patch.object(KittySplitAPI, "_request") as mock_request:
+            mock_request.side_effect = [
+                requests.HTTPError(response=rejected_response),
+                MagicMock(),
+            ]
+            api.select_user("test-user1")
+
+        self.assertEqual(mock_request.call_count, 2)
+        self.assertEqual(mock_request.call_args.kwargs["csrf_token"], "fresh-token")
+        self.assertEqual(self.store.load(api.kitty_id)["csrf_token"], "fresh-token")
+
+    def save_expired_session(self):
+        self.store.save(
+            "test_kitty/ADLKFJLAKD",
+            {
+                "cookies": [],
+                "available_users": {"test-user1": "1"},
+                "selected_viewing_party_id": "1",
+                "csrf_token": "expired-token",
+            },
+        )
+
+    @patch("pykitty.client.get_csrf_token")
+    def test_validates_restored_session_before_reading(self, mock_get_csrf_token):
+        mock_get_csrf_token.return_value = "fresh-token"
+        self.save_expired_session()
+        api = KittySplitAPI(self.kitty_url, session_store=self.store)
+        self.assertIsNone(api.server_viewing_party_id)
+
+        rejected_response = MagicMock(status_code=403)
+        with patch.object(KittySplitAPI, "_request") as mock_request:
+            mock_request.side_effect = [
+                requests.HTTPError(response=rejected_response),
+                MagicMock(),
+                MagicMock(text="<html></html>"),
+            ]
+            api.select_user("test-user1")
+            api.get_expenses()
+
+        # the party is selected in the renewed session before the expenses are read
+        self.assertEqual(
+            [call.args[1] for call in mock_request.call_args_list],
+            ["/parties/set/", "/parties/set/", "/entries/"],
+        )
+        self.assertEqual(
+            mock_request.call_args_list[1].kwargs["csrf_token"], "fresh-token"
+        )
+        self.assertEqual(api.server_viewing_party_id, "1")
+
+    @patch("pykitty.client.get_csrf_token")
+    def test_reselects_party_when_session_expires(self, mock_get_csrf_token):
+        mock_get_csrf_token.return_value = "fresh-token"
+        self.save_expired_session()
+        api = KittySplitAPI(self.kitty_url, session_store=self.store)
+
+        rejected_response = MagicMock(status_code=403)
+        with patch.object(KittySplitAPI, "_request") as mock_request, patch.object(
+            self.store, "save", wraps=self.store.save
+        ) as mock_save:
+            mock_request.side_effect = [
+                MagicMock(),
+                requests.HTTPError(response=rejected_response),
+                MagicMock(),
+                MagicMock(),
+                MagicMock(),
+            ]
+            api.select_user("test-user1")
+            # the session expires after it was validated
+            api.add_expense(amount="10.00", description="Test", entry_date="2023-03-06")
+            api.add_expense(amount="20.00", description="Test", entry_date="2023-03-06")
+
+        self.assertEqual(
+            [call.args[1] for call in mock_request.call_args_list],
+            [
+                "/parties/set/",
+                "/entries/new/expense/",
+                "/parties/set/",
+                "/entries/new/expense/",
+                "/entries/new/expense/",
+            ],
+        )
+        self.assertEqual(mock_request.call_args.kwargs["csrf_token"], "fresh-token")
+        self.assertEqual(api.server_viewing_party_id, "1")
+        # saved after select_user and after the session was renewed, not per expense
+        self.assertEqual(mock_save.call_count, 2)
@@ -0,0 +1,66 @@
+import threading
+import unittest
+
+from pykitty.singleflight import SingleFlight
+
+
+class TestSingleFlight(unittest.TestCase):
+    def run_concurrently(self, flight, func, number_of_callers=5):
+        results, errors = [], []
+        started = threading.Barrier(number_of_callers)
+
+        def caller():
+            started.wait()
+            try:
+                results.append(flight.do("key", func))
+            except Exception as error:
+                errors.append(error)
+
+        threads = [threading.Thread(target=caller) for _ in range(number_of_callers)]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+        return results, errors
+
+    def test_coalesces_concurrent_calls(self):
+        flight = SingleFlight()
+        calls = []
+        release = threading.Event()
+
+        def fetch():
+            calls.append(1)
+            release.wait(timeout=1)
+            return [{"id": "1"}]
+
+        timer = threading.Timer(0.2, release.set)
+        timer.start()
+        results, errors = self.run_concurrently(flight, fetch)
+        timer.cancel()
+
+        self.assertEqual(errors, [])
+        self.assertEqual(len(calls), 1)
+        self.assertEqual(results, [[{"id": "1"}]] * 5)
+        # every caller gets its own copy
+        self.assertEqual(len({id(result) for result in results}), 5)
+
+    def test_propagates_errors(self):
+        flight = SingleFlight()
+        release = threading.Event()
+
+        def fetch():
+            release.wait(timeout=1)
+            raise ValueError("upstream error")
+
+        timer = threading.Timer(0.2, release.set)
+        timer.start()
+        results, errors = self.run_concurrently(flight, fetch)
+        timer.cancel()
+
+        self.assertEqual(results, [])
+        self.assertEqual(len(errors), 5)
+
+    def test_does_not_cache(self):
+        flight = SingleFlight()
+        self.assertEqual(flight.do("key", lambda: 1), 1)
+        self.assertEqual(flight.do("key", lambda: 2), 2)
@@ -0,0 +1,181 @@
+import gzip
+import json
+import tempfile
+import threading
+import time
+import unittest
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from pathlib import Path
+from unittest.mock import MagicMock, patch
+
+import requests
+from requests.adapters import HTTPAdapter
+
+from pykitty.client import KittySplitAPI
+from pykitty.transport import (
+    RecordingAdapter,
+    ReplayAdapter,
+    ReplayMissError,
+    TransportConfig,
+    read_archive,
+)
+
+
+class CountingHandler(BaseHTTPRequestHandler):
+    calls = 0
+
+    def do_GET(self):
+        CountingHandler.calls += 1
+        content = gzip.compress(f"<p>Call {CountingHandler.calls}</p>".encode())
+        self.send_response(200)
+        self.send_header("Content-Encoding", "gzip")
+        self.send_header("Content-Length", str(len(content)))
+        self.send_header("Set-Cookie", "session=abc")
+        self.end_headers()
+        self.wfile.write(content)
+
+    def do_POST(self):
+        self.rfile.read(int(self.headers["Content-Length"]))
+        self.send_response(302)
+        self.send_header("Location", "/entries/")
+        self.send_header("Content-Length", "0")
+        self.end_headers()
+
+    def log_message(self, format, *args):
+        pass
+
+
+class TestTransportConfig(unittest.TestCase):
+    def test_configure_session(self):
+        transport = TransportConfig(pool_maxsize=32, keep_alive=False)
+        session = transport.configure_session(requests.Session())
+        adapter = session.get_adapter("https://kittysplit.de/")
+
+        self.assertIsInstance(adapter, HTTPAdapter)
+        self.assertEqual(adapter._pool_maxsize, 32)
+        self.assertEqual(session.headers["Connection"], "close")
+        # sessions configured by the same transport share the connection pool
+        self.assertIs(
+            transport.configure_session(requests.Session()).get_adapter(
+                "https://kittysplit.de/"
+            ),
+            adapter,
+        )
+        self.assertIsNone(transport.adapter)
+
+    def test_pool_block(self):
+        transport = TransportConfig(pool_maxsize=2, pool_block=True)
+        adapter = transport.get_adapter()
+
+        self.assertTrue(adapter._pool_block)
+
+    @patch("pykitty.client.get_csrf_token")
+    @patch.object(requests.Session, "request")
+    def test_client_applies_transport(self, mock_request, mock_get_csrf_token):
+        mock_request.return_value = MagicMock(text="")
+        mock_get_csrf_token.return_value = "token123"
+        transport = TransportConfig(
+            connect_timeout=1, read_timeout=2, base_url="http://localhost:8000"
+        )
+        with patch.object(KittySplitAPI, "get_users") as mock_get_users:
+            mock_get_users.return_value = {"test-user1": "1"}
+            api = KittySplitAPI(
+                "https://kittysplit.de/test_kitty/ADLKFJLAKD/", transport=transport
+            )
+
+        api.select_user("test-user1")
+        mock_get_csrf_token.assert_called_with(
+            api.session, "http://localhost:8000/", "/parties/set/", timeout=(1, 2)
+        )
+        mock_request.assert_called_with(
+            "POST",
+            "http://localhost:8000/test_kitty/ADLKFJLAKD/parties/set/",
+            data={"viewing_party_id": "1", "_csrf_token": "token123"},
+            timeout=(1, 2),
+        )
+
+
+class TestRecordReplay(unittest.TestCase):
+    def setUp(self):
+        CountingHandler.calls = 0
+        self.server = ThreadingHTTPServer(("127.0.0.1", 0), CountingHandler)
+        threading.Thread(target=self.server.serve_forever, daemon=True).start()
+        self.base_url = f"http://127.0.0.1:{self.server.server_address[1]}"
+        temp_dir = tempfile.TemporaryDirectory()
+        self.addCleanup(temp_dir.cleanup)
+        self.archive_path = Path(temp_dir.name) / "traffic.jsonl.gz"
+
+    def tearDown(self):
+        self.server.shutdown()
+        self.server.server_close()
+
+    def record(self):
+        adapter = RecordingAdapter(self.archive_path)
+        session = TransportConfig(adapter=adapter).configure_session(requests.Session())
+        session.get(self.base_url + "/entries/")
+        session.post(
+            self.base_url + "/parties/set/",
+            data={"viewing_party_id": "1", "_csrf_token": "token123"},
+        )
+        adapter.close()
+
+    def replay_session(self, latency_scale=0.0):
+        adapter = ReplayAdapter(self.archive_path, latency_scale=latency_scale)
+        return TransportConfig(adapter=adapter).configure_session(requests.Session())
+
+    def test_record(self):
+        self.record()
+        records = read_archive(self.archive_path)
+
+        self.assertEqual(
+            [(r["method"], r["status"]) for r in records],
+            [("GET", 200), ("POST", 302), ("GET", 200)],
+        )
+        self.assertEqual(records[0]["text"], "<p>Call 1</p>")
+        self.assertEqual(records[1]["body"], "viewing_party_id=1&_csrf_token=token123")
+        # the content is stored decoded
+        self.assertNotIn("Content-Encoding", dict(records[0]["headers"]))
+
+    def test_read_while_recording(self):
+        adapter = RecordingAdapter(self.archive_path)
+        session = TransportConfig(adapter=adapter).configure_session(requests.Session())
+        session.get(self.base_url + "/entries/")
+        self.assertEqual(len(read_archive(self.archive_path)), 1)
+
+        session.get(self.base_url + "/entries/")
+        self.assertEqual(len(read_archive(self.archive_path)), 2)
+        adapter.close()
+
+    def test_replay(self):
+        self.record()
+        self.server.shutdown()
+        session = self.replay_session()
+
+        response = session.post(
+            "https://kittysplit.de/parties/set/",
+            data={"viewing_party_id": "1", "_csrf_token": "other-token"},
+        )
+        self.assertEqual(response.text, "<p>Call 1</p>")
+        self.assertEqual(response.history[0].status_code, 302)
+        self.assertEqual(response.headers["Set-Cookie"], "session=abc")
+        # the last response of a request is repeated once the others are used up
+        self.assertEqual(session.get(self.base_url + "/entries/").text, "<p>Call 2</p>")
+        self.assertEqual(session.get(self.base_url + "/entries/").text, "<p>Call 2</p>")
+
+        with self.assertRaises(ReplayMissError):
+            session.post(
+                self.base_url + "/parties/set/", data={"viewing_party_id": "2"}
+            )
+
+    def test_replay_latency(self):
+        self.record()
+        records = read_archive(self.archive_path)
+        for record in records:
+            record["elapsed"] = 0.05
+        with gzip.open(self.archive_path, "wt") as archive:
+            archive.writelines(f"{json.dumps(record)}\n" for record in records)
+
+        session = self.replay_session(latency_scale=2.0)
+        start = time.perf_counter()
+        session.get(self.base_url + "/entries/")
+        self.assertGreaterEqual(time.perf_counter() - start, 0.1)
@@ -0,0 +1,118 @@
+import tempfile
+import threading
+import time
+import unittest
+from pathlib import Path
+from unittest.mock import MagicMock, patch
+
+import requests
+
+from pykitty.cli import read_expenses
+from pykitty.watcher import CSVWatcher
+
+CSV_CONTENT = "Datum;Name;Betrag\n01.03.2023;Aral;-10,00\n02.03.2023;Edeka;-5,50\n"
+
+
+class TestCSVWatcher(unittest.TestCase):
+    def setUp(self):
+        self.tmp_dir = tempfile.TemporaryDirectory()
+        self.directory = Path(self.tmp_dir.name)
+        self.api = MagicMock()
+        self.watcher = CSVWatcher(
+            self.api,
+            self.directory,
+            read_expenses,
+            poll_interval=0.01,
+            queue_size=1,
+            timeout_between_requests=0,
+        )
+
+    def tearDown(self):
+        self.tmp_dir.cleanup()
+
+    def run_until(self, condition, timeout=5):
+        thread = threading.Thread(target=self.watcher.run, daemon=True)
+        thread.start()
+        deadline = time.monotonic() + timeout
+        while not condition() and time.monotonic() < deadline:
+            time.sleep(0.01)
+        self.watcher.stop()
+        thread.join(timeout)
+        self.assertFalse(thread.is_alive(), "run() did not return")
+
+    def test_adds_expenses_and_moves_files(self):
+        (self.directory / "a.csv").write_text(CSV_CONTENT)
+        (self.directory / "b.csv").write_text(CSV_CONTENT)
+
+        self.run_until(lambda: self.watcher.stats.files_processed == 2)
+
+        self.assertEqual(self.api.add_expense.call_count, 4)
+        self.api.add_expense.assert_any_call(
+            amount="10.0",
+            description="Aral",
+            entry_date="2023-03-01",
+            weight_mapping=None,
+        )
+        self.assertEqual(self.watcher.stats.rows_written, 4)
+        self.assertEqual(
+            sorted(path.name for path in (self.directory / "processed").iterdir()),
+            ["a.csv", "b.csv"],
+        )
+        self.assertEqual(list(self.directory.glob("*.csv")), [])
+
+    def test_moves_failed_files(self):
+        (self.directory / "invalid.csv").write_text("Datum;Name\n01.03.2023;Aral\n")
+        (self.directory / "rejected.csv").write_text(CSV_CONTENT)
+        self.api.add_expense.side_effect = [None, requests.HTTPError()]
+
+        self.run_until(lambda: self.watcher.stats.files_failed == 2)
+
+        self.assertEqual(self.watcher.stats.rows_written, 1)
+        self.assertEqual(self.watcher.stats.rows_failed, 1)
+        self.assertEqual(
+            sorted(path.name for path in (self.directory / "failed").iterdir()),
+            ["invalid.csv", "rejected.csv"],
+        )
+
+    def test_keeps_scanning_after_unreadable_files(self):
+        (self.directory / "a.csv").write_text(CSV_CONTENT)
+        (self.directory / "short.csv").write_text(
+            "Datum;Name;Betrag\n01.03.2023;Aral\n"
+        )
+
+        with self.assertLogs("pykitty.watcher", "ERROR"):
+            self.run_until(
+                lambda: self.watcher.stats.files_processed == 1
+                and self.watcher.stats.files_failed == 1
+            )
+
+        self.assertEqual(self.watcher.stats.rows_written, 2)
+        self.assertEqual(
+            [path.name for path in (self.directory / "failed").iterdir()],
+            ["short.csv"],
+        )
+
+    def test_leaves_unmovable_files_in_place(self):
+        (self.directory / "a.csv").write_text(CSV_CONTENT)
+
+        with patch("shutil.move", side_effect=PermissionError()):
+            with self.assertLogs("pykitty.watcher", "ERROR"):
+                # scans the directory many times, the file is not read again
+                self.run_until(lambda: False, timeout=0.5)
+
+        self.assertEqual(self.watcher.stats.files_processed, 1)
+        self.assertEqual(self.api.add_expense.call_count, 2)
+        self.assertEqual(list(self.directory.glob("*.csv")), [self.directory / "a.csv"])
+
+    def test_keeps_writing_after_unexpected_errors(self):
+        (self.directory / "a.csv").write_text(CSV_CONTENT)
+        self.api.add_expense.side_effect = [KeyError("test-user2"), None]
+
+        with self.assertLogs("pykitty.watcher", "ERROR"):
+            self.run_until(lambda: self.watcher.stats.files_failed == 1)
+
+        self.assertEqual(self.watcher.stats.rows_written, 1)
+        self.assertEqual(self.watcher.stats.rows_failed, 1)
+        self.assertEqual(
+            [path.name for path in (self.directory / "failed").iterdir()], ["a.csv"]
+        )